@@ -0,0 +1,125 @@
+import time
+import random
+import threading
+
+import LowerBounds
+
+
+class AnytimePlanner:
+    """Closed tour that keeps improving on a background thread until a deadline
+
+    The MST shortcut tour of mst_optimized_tour is ready as soon as the planner is created. A thread
+    then improves the visiting order of a snapshot of the pathfinder with 2-opt and, once 2-opt has
+    converged, with double bridge kicks each followed by 2-opt, keeping the best tour found.
+    2-opt reverses segments, so for asymmetric metrics only the kicks run, which keep every
+    segment's direction.
+    It stops at the deadline, once the optimality gap to the MST lower bound is at most target_gap,
+    or on stop().
+
+    Poll best() for the current tour, or add callbacks, which are called on the planner thread
+    with (tour, cost) after every improvement.
+    """
+
+    def __init__(self, pathfinder, start_key: str = '', time_budget: float = 0.2, target_gap: float = None,
+                 callback=None, seed: int = 0):
+        self.deadline = time.perf_counter() + time_budget
+        self.pathfinder = pathfinder.snapshot()
+        self.startKey = str(start_key)
+        self.targetGap = target_gap
+        self.lowerBound = None  # Computed on the planner thread
+        self.improvements = 0
+
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._callbacks = [] if callback is None else [callback]
+        self._random = random.Random(seed)
+
+        self._bestTour = self.pathfinder.mst_optimized_tour(self.startKey)
+        self._bestCost = self.pathfinder.tour_cost(self._bestTour)
+        self._bestOrder = list(dict.fromkeys(self._bestTour))
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def best(self):
+        """(tour, cost) of the best tour so far"""
+        with self._lock:
+            return (list(self._bestTour), self._bestCost)
+
+    def gap(self):
+        """Optimality gap of the best tour so far, inf until the lower bound is known"""
+        if self.lowerBound is None:
+            return float('inf')
+        return LowerBounds.optimality_gap(self._bestCost, self.lowerBound)
+
+    def add_callback(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def is_running(self):
+        return self._thread.is_alive()
+
+    def stop(self):
+        self._stopEvent.set()
+
+    def wait(self, timeout: float = None):
+        """Block until the planner finishes, then return best()"""
+        self._thread.join(timeout)
+        return self.best()
+
+    ########################################################################
+
+    def _run(self):
+        graph = self.pathfinder.itemGraph
+        self.lowerBound = LowerBounds.mst_weight(graph, self._bestOrder)
+
+        order = list(self._bestOrder)
+        while not self._is_done():
+            if graph.metric.isSymmetric:
+                order = graph.two_opt_order(order, closed=True, deadline=self.deadline, callback=self._offer_order)
+            if self._offer_order(order) or len(order) < 8:
+                break  # Too few keys for a double bridge kick
+            with self._lock:
+                order = self._double_bridge(self._bestOrder)
+
+    def _offer_order(self, order):
+        """Keep the order's tour if it beats the best so far, returns whether planning is done"""
+        tour = self.pathfinder.expand_order(order, closed=True)
+        cost = self.pathfinder.tour_cost(tour)
+
+        if cost < self._bestCost - 1e-9:
+            with self._lock:
+                self._bestTour = tour
+                self._bestCost = cost
+                self._bestOrder = list(order)
+                self.improvements += 1
+                callbacks = list(self._callbacks)
+
+            for callback in callbacks:
+                callback(list(tour), cost)
+
+        return self._is_done()
+
+    def _is_done(self):
+        if self._stopEvent.is_set() or time.perf_counter() >= self.deadline:
+            return True
+        return self.targetGap is not None and self.gap() <= self.targetGap
+
+    def _double_bridge(self, order):
+        """Reconnect three random cuts of the order as A C B D, keeping the first key first"""
+        a, b, c = sorted(self._random.sample(range(1, len(order)), 3))
+        return order[:a] + order[b:c] + order[a:b] + order[c:]
+
+
+if __name__ == '__main__':
+    import Pathfinder
+
+    rng = random.Random(0)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(200)])
+    pathfinder.add_obstacles([(f'OBS{i}', rng.uniform(0, 1000), rng.uniform(0, 1000), 30) for i in range(20)])
+
+    planner = pathfinder.anytime_tour('0', time_budget=0.2)
+    print('initial', planner.best()[1])
+    tour, cost = planner.wait()
+    print('final', cost, 'gap', planner.gap(), 'improvements', planner.improvements)
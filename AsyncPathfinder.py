@@ -0,0 +1,149 @@
+import asyncio
+import functools
+
+import Pathfinder
+
+
+class AsyncPathfinder:
+    """asyncio facade over a Pathfinder
+
+    Queries run in an executor against a read view, a snapshot of the pathfinder that is only replaced
+    once a write has finished, so every query sees a consistent map.
+    Writes are serialized in arrival order and applied to the wrapped pathfinder.
+    Concurrent identical queries against the same read view share one computation, and therefore
+    the same result object, which callers should treat as read only. Queries with unhashable
+    arguments, such as lists, always run on their own.
+    The facade can be created outside of a running event loop.
+    """
+
+    def __init__(self, pathfinder=None, executor=None):
+        self.pathfinder = pathfinder if pathfinder is not None else Pathfinder.Pathfinder()
+        self.executor = executor  # None uses the event loop's default executor
+
+        self._writeLock = None  # Created by the first write, so it belongs to the loop running it
+        self._readView = self.pathfinder.snapshot()
+        self._readViewVersion = 0
+        self._inFlight = {}
+
+    def read_view(self):
+        return self._readView
+
+    ########################################################################
+
+    async def available_path(self, start_key: str = '', end_key: str = '', strategy: str = None):
+        return await self._query('available_path', start_key, end_key, strategy)
+
+    async def exists_path(self, start_key: str = '', end_key: str = '', strategy: str = None):
+        return await self._query('exists_path', start_key, end_key, strategy)
+
+    async def all_reachable(self, start_key: str = '', max_distance: float = float('inf')):
+        return await self._query('all_reachable', start_key, max_distance)
+
+    async def nearest_neighbour(self, start_key: str = ''):
+        return await self._query('nearest_neighbour', start_key)
+
+    async def mst_euler_tour(self, start_key: str = ''):
+        return await self._query('mst_euler_tour', start_key)
+
+    async def mst_optimized_tour(self, start_key: str = ''):
+        return await self._query('mst_optimized_tour', start_key)
+
+    async def exact_tour(self, start_key: str = ''):
+        return await self._query('exact_tour', start_key)
+
+    async def auto_tour(self, start_key: str = ''):
+        return await self._query('auto_tour', start_key)
+
+    async def tour_cost(self, path=()):
+        return await self._query('tour_cost', path)
+
+    ########################################################################
+
+    async def add_item(self, item_id: str = 'A', item_value=None, x_pos: float = 0, y_pos: float = 0):
+        await self._write('add_item', item_id, item_value, x_pos, y_pos)
+
+    async def add_items(self, items=()):
+        await self._write('add_items', list(items))
+
+    async def remove_item(self, item_id: str = ''):
+        await self._write('remove_item', item_id)
+
+    async def remove_items(self, item_ids=()):
+        await self._write('remove_items', list(item_ids))
+
+    async def add_obstacle(self, obs_id: str = 'A', x_pos: float = 0, y_pos: float = 0, radius: float = 0):
+        await self._write('add_obstacle', obs_id, x_pos, y_pos, radius)
+
+    async def add_obstacles(self, obstacles=()):
+        await self._write('add_obstacles', list(obstacles))
+
+    async def remove_obstacle(self, obs_id: str = 'A'):
+        await self._write('remove_obstacle', obs_id)
+
+    async def remove_obstacles(self, obs_ids=()):
+        await self._write('remove_obstacles', list(obs_ids))
+
+    async def move_item(self, item_id: str = '', x_pos: float = 0, y_pos: float = 0):
+        """Set of edges whose blocked state changed, see Pathfinder.move_item"""
+        return await self._write('move_item', item_id, x_pos, y_pos)
+
+    async def move_obstacle(self, obs_id: str = 'A', x_pos: float = 0, y_pos: float = 0, radius: float = None):
+        """Set of edges whose blocked state changed, see Pathfinder.move_obstacle"""
+        return await self._write('move_obstacle', obs_id, x_pos, y_pos, radius)
+
+    async def clear(self):
+        await self._write('clear')
+
+    ########################################################################
+
+    async def _run_in_executor(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def _query(self, method_name: str, *args):
+        query_key = (self._readViewVersion, method_name, args)
+        method = getattr(self._readView, method_name)
+        try:
+            hash(query_key)
+        except TypeError:
+            return await self._run_in_executor(method, *args)
+
+        if query_key not in self._inFlight:
+            future = asyncio.ensure_future(
+                self._run_in_executor(method, *args))
+            self._inFlight[query_key] = future
+            future.add_done_callback(
+                lambda _: self._inFlight.pop(query_key, None))
+
+        # Shield so one cancelled caller does not cancel the computation shared with the others
+        return await asyncio.shield(self._inFlight[query_key])
+
+    async def _write(self, method_name: str, *args):
+        """Result of the write method"""
+        if self._writeLock is None:
+            self._writeLock = asyncio.Lock()
+
+        async with self._writeLock:
+
+            def apply_write():
+                result = getattr(self.pathfinder, method_name)(*args)
+                return (result, self.pathfinder.snapshot())
+
+            result, read_view = await self._run_in_executor(apply_write)
+            self._readView = read_view
+            self._readViewVersion += 1
+            return result
+
+
+if __name__ == '__main__':
+
+    async def main():
+        service = AsyncPathfinder()
+        await service.add_items([('A', 0, 0), ('B', 1, 1), ('C', 1, 2), ('D', 2, 1)])
+        await service.add_obstacle('OBS1', 0.5, 0.5, 0.1)
+
+        tours = await asyncio.gather(*(service.mst_optimized_tour('A') for _ in range(4)))
+        print(tours[0])
+        print(await service.available_path('A', 'B'))
+
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+import os
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+import concurrent.futures
+
+import Pathfinder
+
+# Headless batch runner
+#
+# python Batch.py instances/ other.json --algorithm mst_optimized_tour --workers 8 --output results.jsonl
+#
+# Instance formats
+#
+# - .json: {"items": [[id, x, y], ...], "obstacles": [[id, x, y, radius], ...], "start": id}
+#          items and obstacles may also be objects with id, x, y (and radius) fields
+# - .csv:  rows of type,id,x,y,radius where type is item or obstacle (radius is empty for items)
+# - .npy:  (n, 2) array of item positions, item IDs are the row numbers
+# - .npz:  'items' (n, 2) array and an optional 'obstacles' (m, 3) array of x, y, radius
+#
+# Every instance produces one JSON line with its tour and cost, written as soon as it finishes.
+# Infinite costs and gaps, such as for unreachable items, are written as null.
+
+ALGORITHMS = ('auto_tour', 'exact_tour', 'mst_optimized_tour', 'mst_euler_tour', 'mst_open_tour',
+              'nearest_neighbour', 'euler_tour', 'hierarchical_tour')
+
+INSTANCE_EXTENSIONS = ('.json', '.csv', '.npy', '.npz')
+
+
+def read_instance(path: str):
+    """Returns (items, obstacles, start) where items are (id, x, y) and obstacles are (id, x, y, radius)"""
+    extension = os.path.splitext(path)[1].lower()
+    start = None
+
+    if extension == '.json':
+        with open(path) as instance_file:
+            data = json.load(instance_file)
+
+        def fields(entry, names):
+            return tuple(entry[name] for name in names) if isinstance(entry, dict) else tuple(entry)
+
+        items = [fields(entry, ('id', 'x', 'y')) for entry in data.get('items', [])]
+        obstacles = [fields(entry, ('id', 'x', 'y', 'radius'))
+                     for entry in data.get('obstacles', [])]
+        start = data.get('start')
+    elif extension == '.csv':
+        items = []
+        obstacles = []
+        with open(path, newline='') as instance_file:
+            for row in csv.DictReader(instance_file):
+                if row['type'] == 'item':
+                    items.append((row['id'], row['x'], row['y']))
+                elif row['type'] == 'obstacle':
+                    obstacles.append(
+                        (row['id'], row['x'], row['y'], row['radius']))
+                else:
+                    raise ValueError(f'Unknown row type {row["type"]}')
+    elif extension in ('.npy', '.npz'):
+        import numpy
+
+        arrays = numpy.load(path)
+        item_array = arrays if extension == '.npy' else arrays['items']
+        obstacle_array = arrays['obstacles'] if extension == '.npz' and 'obstacles' in arrays else []
+        items = [(str(i), x, y) for i, (x, y) in enumerate(item_array)]
+        obstacles = [(f'OBS{i}', x, y, r)
+                     for i, (x, y, r) in enumerate(obstacle_array)]
+    else:
+        raise ValueError(f'Unsupported instance format {extension}')
+
+    return (items, obstacles, start)
+
+
+def solve_instance(path: str, algorithm: str = 'mst_optimized_tour', start: str = None, bounds: bool = False):
+    """Solve one instance file, returning a JSON serializable result
+
+    bounds: add the tour's lower bounds and optimality gap, see Pathfinder.tour_bounds
+    """
+    result = {'instance': path, 'algorithm': algorithm}
+    start_time = time.perf_counter()
+
+    try:
+        items, obstacles, instance_start = read_instance(path)
+        if len(items) == 0:
+            raise ValueError('Instance has no items')
+
+        start_key = str(start if start is not None else instance_start if instance_start is not None else items[0][0])
+
+        pathfinder = Pathfinder.Pathfinder()
+        pathfinder.add_items(items)
+        pathfinder.add_obstacles(obstacles)
+
+        if algorithm == 'hierarchical_tour':
+            # Already parallel across instances, keep each instance in its own process
+            tour = pathfinder.hierarchical_tour(start_key, max_workers=1)
+        else:
+            tour = getattr(pathfinder, algorithm)(start_key)
+            if isinstance(tour, dict):
+                tour = tour[start_key]
+
+        result['start'] = start_key
+        result['tour'] = tour
+        result['cost'] = pathfinder.tour_cost(tour)
+        if bounds:
+            result.update(pathfinder.tour_bounds(tour))
+    except Exception as error:
+        result['error'] = f'{type(error).__name__}: {error}'
+
+    result['seconds'] = time.perf_counter() - start_time
+    return result
+
+
+def finite_or_none(value):
+    """value with every infinite or NaN float in it replaced by None, which JSON writes as null"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return dict((key, finite_or_none(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [finite_or_none(item) for item in value]
+    return value
+
+
+def expand_instance_paths(paths=()):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.splitext(name)[1].lower() in INSTANCE_EXTENSIONS:
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def run(paths=(), algorithm: str = 'mst_optimized_tour', start: str = None, workers: int = None, output=sys.stdout,
+        bounds: bool = False):
+    """Solve every instance in a process pool, writing results in completion order
+
+    Returns the number of failed instances.
+    """
+    failures = 0
+
+    def write(result):
+        nonlocal failures
+        failures += 'error' in result
+        output.write(json.dumps(finite_or_none(result), allow_nan=False) + '\n')
+        output.flush()
+
+    paths = list(expand_instance_paths(paths))
+
+    if workers == 1:
+        for path in paths:
+            write(solve_instance(path, algorithm, start, bounds))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            jobs = [executor.submit(solve_instance, path, algorithm, start, bounds)
+                    for path in paths]
+            for job in concurrent.futures.as_completed(jobs):
+                write(job.result())
+
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compute tours for instance files without a display')
+    parser.add_argument('instances', nargs='+',
+                        help='Instance files, or directories of them')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='auto_tour',
+                        help='auto_tour solves instances of up to Pathfinder.EXACT_TOUR_LIMIT items exactly')
+    parser.add_argument('--start', default=None,
+                        help='Start item ID, defaults to the instance start or its first item')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes, defaults to the CPU count')
+    parser.add_argument('--output', default=None,
+                        help='JSON lines output file, defaults to stdout')
+    parser.add_argument('--bounds', action='store_true',
+                        help='Report the MST lower bound, the 1-tree bound of closed tours and the optimality gap of each tour')
+    arguments = parser.parse_args(argv)
+
+    if arguments.output is None:
+        failures = run(arguments.instances, arguments.algorithm,
+                       arguments.start, arguments.workers, bounds=arguments.bounds)
+    else:
+        with open(arguments.output, 'w') as output:
+            failures = run(arguments.instances, arguments.algorithm,
+                           arguments.start, arguments.workers, output, arguments.bounds)
+
+    return 1 if failures > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import random
+import statistics
+import subprocess
+
+# Benchmarks, run with python Benchmark.py
+
+IMPORT_MODULES = ('CompleteGraph', 'LineIntersection', 'SpatialHash', 'Pathfinder',
+                  'Batch', 'Partition', 'HierarchicalTour', 'AsyncPathfinder', 'CostMatrixGraph')
+
+
+def import_time(module_name: str, repeats: int = 5):
+    """Median seconds for a fresh interpreter to import module_name, and whether numpy was loaded"""
+    source = (f'import sys, time\n'
+              f'start = time.perf_counter()\n'
+              f'import {module_name}\n'
+              f'print(time.perf_counter() - start, "numpy" in sys.modules)\n')
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    durations = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', source], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout.split()
+        durations.append(float(output[0]))
+
+    return (statistics.median(durations), output[1] == 'True')
+
+
+def benchmark_imports(repeats: int = 5):
+    print(f'{"module":<20}{"import ms":>12}  numpy loaded')
+    for module_name in IMPORT_MODULES:
+        duration, loads_numpy = import_time(module_name, repeats)
+        print(f'{module_name:<20}{duration * 1000:>12.1f}  {loads_numpy}')
+
+
+def obstacle_map(item_count: int = 200, obstacle_count: int = 60, radius: float = 40, seed: int = 0):
+    """Pathfinder with uniformly random items and obstacles on a 1000 by 1000 square"""
+    import Pathfinder
+
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000))
+                          for i in range(item_count)])
+    pathfinder.add_obstacles([(f'OBS{i}', rng.uniform(0, 1000), rng.uniform(0, 1000), rng.uniform(radius / 2, radius))
+                              for i in range(obstacle_count)])
+    return pathfinder
+
+
+PATH_STRATEGIES = (
+    ('dijkstra', lambda graph, start_key, end_key: graph.dijkstra(start_key, end_key)),
+    ('a_star', lambda graph, start_key, end_key: graph.a_star(start_key, end_key)),
+    ('alt', lambda graph, start_key, end_key: graph.a_star(
+        start_key, end_key, graph.landmark_table().heuristic(end_key))),
+    ('bidirectional', lambda graph, start_key, end_key: graph.bidirectional_a_star(start_key, end_key)))
+
+
+def benchmark_paths(item_count: int = 200, obstacle_counts=(0, 60, 150), query_count: int = 50, seed: int = 0):
+    """Mean expanded vertices and query time of each point to point strategy, favouring queries with a blocked direct edge"""
+    print(f'{"obstacles":<10}{"strategy":<16}{"expanded":>10}{"query ms":>10}')
+
+    for obstacle_count in obstacle_counts:
+        pathfinder = obstacle_map(item_count, obstacle_count, seed=seed)
+        graph = pathfinder.itemGraph
+        keys = sorted(pathfinder.item_keys())
+        rng = random.Random(seed)
+
+        # Prefer queries whose direct edge is blocked, those are the ones that need a search
+        queries = [tuple(rng.sample(keys, 2)) for _ in range(query_count * 20)]
+        blocked = [query for query in queries if graph.is_edge_blocked(*query)]
+        queries = (blocked + queries)[:query_count]
+
+        graph.landmark_table()  # Preprocessing is not part of the query time
+
+        for strategy, query_path in PATH_STRATEGIES:
+            start_time = time.perf_counter()
+            expanded = sum(query_path(graph, *query)['expanded'] for query in queries)
+            duration = (time.perf_counter() - start_time) / len(queries)
+            print(f'{obstacle_count:<10}{strategy:<16}{expanded / len(queries):>10.1f}{duration * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    start_time = time.perf_counter()
+    benchmark_imports()
+    print()
+    benchmark_paths()
+    print(f'{time.perf_counter() - start_time:.2f} s')
@@ -1,34 +1,163 @@
 import copy
 import math
+import hashlib
+import time
 import operator
 import heapq
+import itertools
 from collections import deque
 
+import Metric
+
 # Supports edge blocking where algorithms will not traverse an edge that is marked blocked
 
+# Versions are unique across graphs so a cleared graph never reuses a cached version
+_version_counter = itertools.count(1)
+
 ##########################################################################################################
 
 
 class CompleteGraph:
 
-    def __init__(self):
+    def __init__(self, metric=None):
+        """metric: None (euclidean), 'manhattan', 'chebyshev', a Metric or a function of two positions"""
         # Initialize instance variables
         self.vertexDict = {}
+        self.metric = Metric.get_metric(metric)
         self.blockedEdges = set()
+        self.version = next(_version_counter)
+
+        # Copy-on-write state, see snapshot()
+        self._isFrozen = False
+        self._isVertexDictShared = False
+        self._isBlockedEdgesShared = False
+
+        # Precomputed all pairs paths, see enable_path_oracle()
+        self.pathOracleEnabled = False
+        self._pathOracle = None
+        self._landmarkTable = None  # See landmark_table()
+        self._fingerprint = (None, '')  # (version, digest), see fingerprint()
 
-    def push_vertex(self, key: str = '', value=None, x: float = 0, y: float = 0):
+    def snapshot(self):
+        """Read only view of the current version in O(1)
+
+        The snapshot shares the vertex and blocked edge containers with this graph.
+        The next mutation of this graph copies only the container it touches,
+        so containers that did not change stay shared between versions.
+        """
+        if self._isFrozen:
+            return self
+
+        graph_snapshot = CompleteGraph(self.metric)
+        graph_snapshot.vertexDict = self.vertexDict
+        graph_snapshot.blockedEdges = self.blockedEdges
+        graph_snapshot.version = self.version
+        graph_snapshot._isFrozen = True
+        graph_snapshot.pathOracleEnabled = self.pathOracleEnabled
+        graph_snapshot._pathOracle = self._pathOracle
+        graph_snapshot._landmarkTable = self._landmarkTable
+        graph_snapshot._fingerprint = self._fingerprint
+
+        self._isVertexDictShared = True
+        self._isBlockedEdgesShared = True
+        return graph_snapshot
+
+    def copy(self):
+        """Independent copy of the vertices and blocked edges, sharing the stored values"""
+        graph_copy = CompleteGraph(self.metric)
+        graph_copy.vertexDict = {key: list(entry)
+                                 for key, entry in self.vertexDict.items()}
+        graph_copy.blockedEdges = set(self.blockedEdges)
+        graph_copy.version = self.version
+        graph_copy.pathOracleEnabled = self.pathOracleEnabled
+        graph_copy._pathOracle = self._pathOracle
+        graph_copy._landmarkTable = self._landmarkTable
+        graph_copy._fingerprint = self._fingerprint
+        return graph_copy
+
+    def enable_path_oracle(self, enabled: bool = True, oracle=None):
+        """Answer path queries from precomputed all pairs tables, see PathOracle
+
+        The tables are built on the first query and rebuilt on the first query after any change
+        to the vertices or blocked edges. A previously saved oracle that matches the graph can be
+        passed in to skip the first build.
+        """
+        self.pathOracleEnabled = enabled
+        if oracle is not None:
+            if not oracle.matches(self):
+                raise ValueError('Path oracle does not match the graph')
+            oracle.version = self.version
+            self._pathOracle = oracle
+
+    def path_oracle(self):
+        """PathOracle for the current version, building it if needed"""
+        import PathOracle
+
+        oracle = self._pathOracle
+        if oracle is None or oracle.version != self.version:
+            oracle = PathOracle.PathOracle(self)
+            self._pathOracle = oracle
+        return oracle
+
+    def landmark_table(self, count: int = 8):
+        """LandmarkTable for the current version, building it if needed"""
+        import Landmarks
+
+        table = self._landmarkTable
+        if table is None or table.version != self.version or table.count != count:
+            table = Landmarks.LandmarkTable(self, count)
+            self._landmarkTable = table
+        return table
+
+    def fingerprint(self):
+        """Hash of the vertex keys, positions and blocked edges, computed once per version
+
+        Unlike the version it is the same for equal graphs, such as one rebuilt after clearing.
+        The metric and the stored values are not covered.
+        """
+        if self._fingerprint[0] != self.version:
+            digest = hashlib.sha256()
+            for key in sorted(self.vertexDict):
+                digest.update(f'{key}\0{self.vertexDict[key][1]}\0'.encode())
+            digest.update(b'\1')
+            for edge in sorted(tuple(sorted(edge)) for edge in self.blockedEdges):
+                digest.update(f'{edge[0]}\0{edge[1]}\0'.encode())
+            self._fingerprint = (self.version, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def _bump_version(self):
+        self.version = next(_version_counter)
+
+    def _prepare_vertex_write(self):
+        if self._isFrozen:
+            raise RuntimeError('Graph snapshots are read only')
+        if self._isVertexDictShared:
+            self.vertexDict = dict(self.vertexDict)
+            self._isVertexDictShared = False
+
+    def _prepare_blocked_edge_write(self):
+        if self._isFrozen:
+            raise RuntimeError('Graph snapshots are read only')
+        if self._isBlockedEdgesShared:
+            self.blockedEdges = set(self.blockedEdges)
+            self._isBlockedEdgesShared = False
+
+    def push_vertex(self, key: str = '', value=None, x: float = 0, y: float = 0, position=None):
+        """position gives coordinates in any number of dimensions, in place of x and y"""
         key = str(key)
-        x = float(x)
-        y = float(y)
         if key != '' and not self.has_vertex(key):
-            newVertexPosition = (x, y)
+            newVertexPosition = self._make_position(x, y, position)
+            self._prepare_vertex_write()
             self.vertexDict[key] = [value, newVertexPosition]
+            self._bump_version()
         else:
             raise ValueError(f"Vertex {key} already in graph")
 
     def pop_vertex(self, key: str = ''):
         key = str(key)
         self._validate_keys_in_graph(key)
+        self._prepare_vertex_write()
+        self._prepare_blocked_edge_write()
         del self.vertexDict[key]
 
         edge_remove_queue = []
@@ -39,13 +168,17 @@ class CompleteGraph:
         for edge in edge_remove_queue:
             self.blockedEdges.remove(edge)
 
+        self._bump_version()
+
     def block_edge(self, key_a: str = '', key_b: str = ''):
         key_a = str(key_a)
         key_b = str(key_b)
         self._validate_keys_in_graph(key_a, key_b)
 
         if not self.is_edge_blocked(key_a, key_b):
+            self._prepare_blocked_edge_write()
             self.blockedEdges.add((key_a, key_b))
+            self._bump_version()
         else:
             raise ValueError(f'Edge {{{key_a}, {key_b}}} already blocked')
 
@@ -53,10 +186,12 @@ class CompleteGraph:
         key_a = str(key_a)
         key_b = str(key_b)
         if self.is_edge_blocked(key_a, key_b):
+            self._prepare_blocked_edge_write()
             if (key_a, key_b) in self.blockedEdges:
                 self.blockedEdges.remove((key_a, key_b))
             else:
                 self.blockedEdges.remove((key_b, key_a))
+            self._bump_version()
         else:
             raise ValueError(f'Edge {{{key_a}, {key_b}}} was not blocked')
 
@@ -68,13 +203,14 @@ class CompleteGraph:
         else:
             return True  # Deny loops
 
-    def set_position(self, key: str = '', x: float = 0, y: float = 0):
+    def set_position(self, key: str = '', x: float = 0, y: float = 0, position=None):
         key = str(key)
         self._validate_keys_in_graph(key)
-        x = float(x)
-        y = float(y)
-        newVertexPosition = (x, y)
-        self.vertexDict[key][1] = newVertexPosition
+        newVertexPosition = self._make_position(x, y, position)
+        # Replace rather than mutate the entry, it may be shared with a snapshot
+        self._prepare_vertex_write()
+        self.vertexDict[key] = [self.vertexDict[key][0], newVertexPosition]
+        self._bump_version()
 
     def get_position(self, key: str = ''):
         key = str(key)
@@ -82,6 +218,29 @@ class CompleteGraph:
         position = self.vertexDict[key][1]
         return position
 
+    def dimensions(self):
+        """Number of coordinates of every vertex position, None while the graph is empty"""
+        for entry in self.vertexDict.values():
+            return len(entry[1])
+        return None
+
+    def position_array(self, keys=None):
+        """Positions of the keys, every vertex by default, as a (keys, dimensions) numpy array"""
+        import numpy
+
+        keys = self.vertex_set_tuple() if keys is None else keys
+        return numpy.array([self.vertexDict[key][1] for key in keys],
+                           dtype=float).reshape(len(keys), self.dimensions() or 2)
+
+    def _make_position(self, x: float = 0, y: float = 0, position=None):
+        position = (float(x), float(y)) if position is None else tuple(
+            float(coordinate) for coordinate in position)
+        dimensions = self.dimensions()
+        if dimensions is not None and len(position) != dimensions:
+            raise ValueError(
+                f'Position {position} does not have the {dimensions} dimensions of the graph')
+        return position
+
     def has_vertex(self, key: str = ''):
         key = str(key)
         return key in self.vertexDict
@@ -96,11 +255,19 @@ class CompleteGraph:
 
         position_a = self.get_position(key_a)
         position_b = self.get_position(key_b)
-        delta_x = position_a[0] - position_b[0]
-        delta_y = position_a[1] - position_b[1]
-        distance = math.sqrt(delta_x * delta_x + delta_y * delta_y)
+        distance = self.metric.distance(position_a, position_b)
         return distance
 
+    def _lower_bound_distance(self, key_a: str, key_b: str):
+        """Lower bound on the length of any path between the keys
+
+        The direct distance, ignoring blocked edges, for metrics that obey the triangle inequality
+        and 0 for any other metric.
+        """
+        if not self.metric.obeysTriangleInequality:
+            return 0.0
+        return self.metric.distance(self.vertexDict[key_a][1], self.vertexDict[key_b][1])
+
     def get_all_adjacent(self, key: str = ''):
         """Closest adjacent list
 
@@ -114,6 +281,9 @@ class CompleteGraph:
         output.sort(key=operator.itemgetter(1, 0))
         return output
 
+    def vertex_count(self):
+        return len(self.vertexDict)
+
     def vertex_set(self):
         return set(key for key in self.vertexDict)
 
@@ -210,24 +380,44 @@ class CompleteGraph:
         return output
 
     def euler_tour_by_mst(self, start_key: str = ''):
+        return list(self.euler_tour_by_mst_generator(start_key))
+
+    def euler_tour_by_mst_generator(self, start_key: str = '', end_key: str = ''):
+        """Yield the Euler tour around the prim MST one vertex at a time
+
+        Only the MST and the traversal stack are held in memory, the tour itself is never materialized.
+        With an end key, the branch leading to the end key is always descended last, so every other
+        vertex is first visited before the end key's subtree.
+        """
         start_key = str(start_key)
+        end_key = str(end_key)
         self._validate_keys_in_graph(start_key)
 
         key_stack = [start_key]
         is_visited = set()
-        output = []
 
         mst_adjacency_dict = self.get_mst(start_key)
+
+        # For any vertex that isn't the start, the first vertex in its adjacency list is its parent
+        end_branch_child = {}
+        if end_key != '' and end_key in mst_adjacency_dict:
+            branch_key = end_key
+            while branch_key != start_key:
+                parent_key = mst_adjacency_dict[branch_key][0]
+                end_branch_child[parent_key] = branch_key
+                branch_key = parent_key
+
         mst_adjacency_dict_heapable = dict(
             (key, []) for key in mst_adjacency_dict)
         for key in mst_adjacency_dict_heapable:
             mst_adjacency_dict_heapable[key] = [(self.get_distance(
-                key, adjacent_key), adjacent_key) for adjacent_key in mst_adjacency_dict[key]]
+                key, adjacent_key), adjacent_key) for adjacent_key in mst_adjacency_dict[key]
+                if adjacent_key != end_branch_child.get(key)]
             heapq.heapify(mst_adjacency_dict_heapable[key])
 
         while len(key_stack) > 0:
             current_key = key_stack[-1]
-            output.append(current_key)
+            yield current_key
             foundUnvisitedAdjacent = False
 
             if current_key not in is_visited:
@@ -248,21 +438,130 @@ class CompleteGraph:
                     # Break so that the closest are considered first. Equivalent to simulating stack
                     # or reversing a sorted list that goes into a stack.
 
+            branch_child_key = end_branch_child.get(current_key)
+            if not foundUnvisitedAdjacent and branch_child_key is not None and branch_child_key not in is_visited:
+                key_stack.append(branch_child_key)
+                foundUnvisitedAdjacent = True
+
             if not foundUnvisitedAdjacent:
                 key_stack.pop()
 
-        return output
+    def two_opt_order(self, order=(), closed: bool = True, fixed_end: bool = False, deadline: float = None,
+                      callback=None):
+        """2-opt local search over a visiting order of distinct keys
+
+        The first key always stays first.
+        closed: the order returns to its first key. Otherwise the order is an open path whose last key
+                is free to change unless fixed_end is set.
+        deadline: time.perf_counter() value after which the best order so far is returned.
+        callback: called with a copy of the order after every pass that improved it, returning
+                  True stops the search early.
+
+        Blocked legs are costed by their detour, which is only searched for moves that already
+        improve on the straight-line lower bound of the new legs.
+        Reversing a segment reverses the direction of its legs, so for asymmetric metrics each move
+        is costed with the whole segment, from running totals of the legs in both directions.
+        """
+        order = [str(key) for key in order]
+        self._validate_keys_in_graph(*order)
+        n = len(order)
+        is_symmetric = self.metric.isSymmetric
+        leg_costs = {}
+
+        def leg_cost(key_a, key_b):
+            if key_b is None:
+                return 0.0
+            edge = (key_b, key_a) if is_symmetric and key_b < key_a else (key_a, key_b)
+            if edge not in leg_costs:
+                if self.is_edge_blocked(key_a, key_b):
+                    leg_costs[edge] = self.available_path(key_a, key_b)[1]
+                else:
+                    leg_costs[edge] = self.get_distance(key_a, key_b)
+            return leg_costs[edge]
+
+        def leg_lower_bound(key_a, key_b):
+            return 0.0 if key_b is None else self._lower_bound_distance(key_a, key_b)
+
+        def key_after(j):
+            if j + 1 < n:
+                return order[j + 1]
+            return order[0] if closed else None
+
+        # forward_totals[k] and backward_totals[k]: cost of the legs between order[0] and order[k],
+        # walked forwards and backwards, only kept for asymmetric metrics
+        forward_totals = backward_totals = None
+
+        def update_totals():
+            nonlocal forward_totals, backward_totals
+            if not is_symmetric:
+                forward_totals = [0.0] + list(itertools.accumulate(
+                    leg_cost(order[k], order[k + 1]) for k in range(n - 1)))
+                backward_totals = [0.0] + list(itertools.accumulate(
+                    leg_cost(order[k + 1], order[k]) for k in range(n - 1)))
+
+        def reversal_change(i, j):
+            """Change in the cost of the legs inside order[i:j + 1] when it is reversed"""
+            if is_symmetric:
+                return 0.0
+            return (backward_totals[j] - backward_totals[i]) - (forward_totals[j] - forward_totals[i])
+
+        last_reversible = n - 2 if not closed and fixed_end else n - 1
+        improved = True
+        update_totals()
+
+        while improved:
+            improved = False
+            for i in range(1, n - 1):
+                for j in range(i + 1, last_reversible + 1):
+                    key_a, key_b, key_c, key_d = order[i - 1], order[i], order[j], key_after(j)
+                    current_cost = leg_cost(key_a, key_b) + leg_cost(key_c, key_d) - reversal_change(i, j)
+
+                    if leg_lower_bound(key_a, key_c) + leg_lower_bound(key_b, key_d) >= current_cost - 1e-9:
+                        continue
+
+                    if leg_cost(key_a, key_c) + leg_cost(key_b, key_d) < current_cost - 1e-9:
+                        order[i:j + 1] = order[i:j + 1][::-1]
+                        improved = True
+                        update_totals()
+
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return order
+
+            if improved and callback is not None and callback(list(order)):
+                return order
+
+        return order
 
     ##########################################################################################################
 
-    def available_path(self, start_key: str = '', end_key: str = ''):
+    def available_path(self, start_key: str = '', end_key: str = '', strategy: str = None):
+        """Shortest (path, distance) between two vertices, ([''], inf) if there is none
+
+        strategy is 'a_star', 'alt' (A* with landmark lower bounds), 'bidirectional'
+        (bidirectional A*), 'dijkstra' or 'oracle' (PathOracle lookup).
+        None uses the oracle when it is enabled and A* otherwise.
+        """
         start_key = str(start_key)
         end_key = str(end_key)
         self._validate_keys_in_graph(start_key, end_key)
 
+        if strategy is None:
+            strategy = 'oracle' if self.pathOracleEnabled else 'a_star'
+
         path = []
-        # data = self.dijkstra(start_key, end_key)
-        data = self.a_star(start_key, end_key)
+        if strategy == 'oracle':
+            return self.path_oracle().path(start_key, end_key)
+        elif strategy == 'a_star':
+            data = self.a_star(start_key, end_key)
+        elif strategy == 'alt':
+            data = self.a_star(start_key, end_key,
+                               self.landmark_table().heuristic(end_key))
+        elif strategy == 'bidirectional':
+            data = self.bidirectional_a_star(start_key, end_key)
+        elif strategy == 'dijkstra':
+            data = self.dijkstra(start_key, end_key)
+        else:
+            raise ValueError(f'Unknown path strategy {strategy}')
 
         if start_key == end_key:
             output = ([start_key], 0.0)
@@ -280,9 +579,9 @@ class CompleteGraph:
 
         return output
 
-    def exists_path(self, start_key: str = '', end_key: str = ''):
-        path_data = self.available_path(start_key, end_key)
-        return path_data != ('', math.inf)
+    def exists_path(self, start_key: str = '', end_key: str = '', strategy: str = None):
+        path_data = self.available_path(start_key, end_key, strategy)
+        return path_data[1] != math.inf
 
     def all_reachable(self, start_key: str = '', max_distance: float = math.inf):
         start_key = str(start_key)
@@ -299,14 +598,20 @@ class CompleteGraph:
 
         return output_paths
 
-    def a_star(self, start_key: str = '', target_key: str = ''):
+    def a_star(self, start_key: str = '', target_key: str = '', heuristic=None):
+        """heuristic(key) must be a consistent lower bound on the distance to the target,
+        the direct distance ignoring blocked edges by default"""
         start_key = str(start_key)
         target_key = str(target_key)
         self._validate_keys_in_graph(start_key)
         self._validate_keys_in_graph(target_key)
 
+        # The direct distance ignores blocked edges, so it never overestimates
         def get_h_score(key_a: str):
-            return self.get_distance(key_a, target_key)
+            return self._lower_bound_distance(key_a, target_key)
+
+        if heuristic is not None:
+            get_h_score = heuristic
 
         vertex_keys = self.vertex_set_tuple()
         distances = {}  # Closed set
@@ -324,6 +629,11 @@ class CompleteGraph:
         while len(f_score) > 0:
             current = heapq.heappop(f_score)
             current_key = current[1]
+
+            # Everything left in the open set is unreachable
+            if g_score[current_key] == math.inf:
+                break
+
             distances[current_key] = g_score[current_key]
 
             if current_key == target_key:
@@ -351,6 +661,96 @@ class CompleteGraph:
         return_dict = {}
         return_dict['distance'] = distances
         return_dict['previous'] = previous
+        return_dict['expanded'] = len(distances)
+        return return_dict
+
+    def bidirectional_a_star(self, start_key: str = '', target_key: str = ''):
+        """A* from both ends at once, returning the same dictionary as a_star
+
+        Each side is guided by the direct distance to the other end. mu is the shortest
+        start to target path seen where the two searches touch, and the search stops once the
+        smallest key on either side reaches mu, since no path through an unexpanded vertex can
+        then be shorter.
+        'distance' holds the forward search distances and the target distance, and 'previous'
+        leads from the target back to the start along the shortest path.
+        """
+        start_key = str(start_key)
+        target_key = str(target_key)
+        self._validate_keys_in_graph(start_key, target_key)
+
+        vertex_keys = self.vertex_set_tuple()
+        ends = (start_key, target_key)
+        g_scores = ({start_key: 0.0}, {target_key: 0.0})
+        previous_keys = ({start_key: ''}, {target_key: ''})
+        closed_sets = (set(), set())
+        start_bound = self._lower_bound_distance(start_key, target_key)
+        open_heaps = ([(start_bound, start_key)], [(start_bound, target_key)])
+
+        # mu is the length of the best path found so far, through meeting_key
+        mu = 0.0 if start_key == target_key else math.inf
+        meeting_key = start_key if start_key == target_key else None
+
+        while len(open_heaps[0]) > 0 and len(open_heaps[1]) > 0:
+            if max(open_heaps[0][0][0], open_heaps[1][0][0]) >= mu:
+                break
+
+            side = 0 if open_heaps[0][0][0] <= open_heaps[1][0][0] else 1
+            other = 1 - side
+            current_key = heapq.heappop(open_heaps[side])[1]
+            if current_key in closed_sets[side]:
+                continue  # Stale entry of a vertex that was since reached more cheaply
+            closed_sets[side].add(current_key)
+
+            g_score = g_scores[side]
+            current_distance = g_score[current_key]
+            current_position = self.vertexDict[current_key][1]
+            goal_key = ends[other]
+            is_backward = side == 1  # The backward search follows edges against their direction
+
+            for adjacent_key in vertex_keys:
+                if adjacent_key in closed_sets[side] or self.is_edge_blocked(current_key, adjacent_key):
+                    continue
+
+                adjacent_position = self.vertexDict[adjacent_key][1]
+                if is_backward:
+                    tentative_distance = current_distance + self.metric.distance(adjacent_position, current_position)
+                    bound = self._lower_bound_distance(goal_key, adjacent_key)
+                else:
+                    tentative_distance = current_distance + self.metric.distance(current_position, adjacent_position)
+                    bound = self._lower_bound_distance(adjacent_key, goal_key)
+
+                if tentative_distance < g_score.get(adjacent_key, math.inf):
+                    g_score[adjacent_key] = tentative_distance
+                    previous_keys[side][adjacent_key] = current_key
+                    heapq.heappush(open_heaps[side], (tentative_distance + bound, adjacent_key))
+
+                    through_distance = tentative_distance + g_scores[other].get(adjacent_key, math.inf)
+                    if through_distance < mu:
+                        mu = through_distance
+                        meeting_key = adjacent_key
+
+        distances = dict((key, g_scores[0][key]) for key in closed_sets[0])
+        distances[start_key] = 0.0
+        previous = dict((key, '') for key in vertex_keys)
+
+        if meeting_key is not None:
+            distances[target_key] = mu
+
+            current_key = meeting_key
+            while current_key != start_key:
+                previous[current_key] = previous_keys[0][current_key]
+                current_key = previous[current_key]
+
+            current_key = meeting_key
+            while current_key != target_key:
+                next_key = previous_keys[1][current_key]
+                previous[next_key] = current_key
+                current_key = next_key
+
+        return_dict = {}
+        return_dict['distance'] = distances
+        return_dict['previous'] = previous
+        return_dict['expanded'] = len(closed_sets[0]) + len(closed_sets[1])
         return return_dict
 
     def dijkstra(self, start_key: str = '', target_key: str = ''):
@@ -406,6 +806,7 @@ class CompleteGraph:
 
         returnDict['distance'] = closedSetDistances
         returnDict['previous'] = previous
+        returnDict['expanded'] = len(closedSetDistances)
         return returnDict
 
     def nearest_neighbour(self, start_key: str = ''):
@@ -0,0 +1,316 @@
+import math
+import heapq
+import time
+
+import numpy
+
+
+class CostMatrixGraph:
+    """Directed complete graph whose edge costs come from a cost matrix, for asymmetric travel costs
+
+    cost(a, b) is matrix[a, b] and need not equal cost(b, a), such as with one-way aisles and lifts.
+    Infinite costs are missing edges.
+
+    The matrix is used as given, without copying: a numpy array, a numpy memmap (see load) or a
+    sparse matrix in CSR form. Sparse matrices are anything with indptr, indices, data and shape
+    attributes, such as scipy's csr_matrix, with the column indices of every row sorted. Entries
+    that are not stored are missing edges.
+
+    Work is done a row at a time, so graphs of 20000 vertices only ever hold a few rows in memory
+    beyond the matrix itself.
+    """
+
+    def __init__(self, matrix, keys=None):
+        self.isSparse = all(hasattr(matrix, name) for name in ('indptr', 'indices', 'data'))
+        if not self.isSparse and not hasattr(matrix, 'shape'):
+            matrix = numpy.asarray(matrix, dtype=float)
+
+        if len(matrix.shape) != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError(f'Cost matrix must be square, not {matrix.shape}')
+
+        self.matrix = matrix
+        self.keys = tuple(str(i) for i in range(matrix.shape[0])) if keys is None else tuple(str(key) for key in keys)
+        if len(self.keys) != matrix.shape[0]:
+            raise ValueError('There must be one key per matrix row')
+
+        self.keyIndex = dict((key, i) for i, key in enumerate(self.keys))
+        if len(self.keyIndex) != len(self.keys):
+            raise ValueError('Keys must be unique')
+
+        self._outNeighbours = None  # Cheapest successors of every vertex, see _out_neighbours
+
+    @staticmethod
+    def load(file, keys=None):
+        """Graph over a matrix saved with numpy.save (memory-mapped, read only) or a sparse .npz
+        holding indptr, indices, data and shape arrays"""
+        if str(file).endswith('.npz'):
+            with numpy.load(file) as arrays:
+                matrix = _SparseMatrix(arrays['indptr'], arrays['indices'],
+                                       arrays['data'], tuple(arrays['shape']))
+        else:
+            matrix = numpy.load(file, mmap_mode='r')
+        return CostMatrixGraph(matrix, keys)
+
+    def vertex_count(self):
+        return len(self.keys)
+
+    def cost(self, key_a: str = '', key_b: str = ''):
+        self._validate_keys_in_graph(key_a, key_b)
+        return self._cost(self.keyIndex[key_a], self.keyIndex[key_b])
+
+    def _cost(self, index_a: int, index_b: int):
+        if index_a == index_b:
+            return 0.0
+        if not self.isSparse:
+            return float(self.matrix[index_a, index_b])
+
+        start = self.matrix.indptr[index_a]
+        end = self.matrix.indptr[index_a + 1]
+        position = start + numpy.searchsorted(self.matrix.indices[start:end], index_b)
+        if position < end and self.matrix.indices[position] == index_b:
+            return float(self.matrix.data[position])
+        return math.inf
+
+    def _row(self, index: int):
+        """Costs from one vertex to every vertex as a new array, with 0 to itself"""
+        if self.isSparse:
+            row = numpy.full(len(self.keys), math.inf)
+            start = self.matrix.indptr[index]
+            end = self.matrix.indptr[index + 1]
+            row[self.matrix.indices[start:end]] = self.matrix.data[start:end]
+        else:
+            row = numpy.array(self.matrix[index], dtype=float)
+        row[index] = 0
+        return row
+
+    def _validate_keys_in_graph(self, *keys):
+        for key in keys:
+            if key not in self.keyIndex:
+                raise ValueError(f'Vertex {key} not in graph')
+
+    ##########################################################################################################
+
+    def dijkstra(self, start_key: str = '', target_key: str = ''):
+        """Shortest distances along directed edges, in the dictionary form of CompleteGraph.dijkstra"""
+        return self.a_star(start_key, target_key)
+
+    def a_star(self, start_key: str = '', target_key: str = '', heuristic=None):
+        """A* along directed edges, Dijkstra when heuristic is None
+
+        A cost matrix gives no geometry to bound the remaining cost with, so there is no default
+        heuristic. heuristic(key) may supply a consistent lower bound on the cost to the target.
+        Vertices are relaxed one matrix row at a time.
+        """
+        self._validate_keys_in_graph(start_key)
+        if target_key != '':
+            self._validate_keys_in_graph(target_key)
+
+        n = len(self.keys)
+        start_index = self.keyIndex[start_key]
+        target_index = self.keyIndex[target_key] if target_key != '' else -1
+        g_score = numpy.full(n, math.inf)
+        g_score[start_index] = 0
+        parents = numpy.full(n, -1, dtype=numpy.int64)
+        is_closed = numpy.zeros(n, dtype=bool)
+        h_scores = numpy.zeros(n) if heuristic is None else numpy.array(
+            [heuristic(key) for key in self.keys], dtype=float)
+
+        open_heap = [(h_scores[start_index], start_index)]
+        expanded = 0
+
+        while len(open_heap) > 0:
+            current_index = heapq.heappop(open_heap)[1]
+            if is_closed[current_index]:
+                continue  # Outdated entry
+            is_closed[current_index] = True
+            expanded += 1
+
+            if current_index == target_index:
+                break
+
+            tentative = g_score[current_index] + self._row(current_index)
+            improved = numpy.flatnonzero((tentative < g_score) & ~is_closed)
+            g_score[improved] = tentative[improved]
+            parents[improved] = current_index
+            for index, f_score in zip(improved.tolist(), (tentative[improved] + h_scores[improved]).tolist()):
+                heapq.heappush(open_heap, (f_score, index))
+
+        distances = dict((self.keys[i], float(g_score[i])) for i in numpy.flatnonzero(is_closed))
+        previous = dict((key, '') for key in self.keys)
+        for i in numpy.flatnonzero(parents >= 0):
+            previous[self.keys[i]] = self.keys[parents[i]]
+
+        return {'distance': distances, 'previous': previous, 'expanded': expanded}
+
+    def available_path(self, start_key: str = '', end_key: str = '', heuristic=None):
+        """Cheapest directed (path, cost), ([''], inf) if there is none"""
+        self._validate_keys_in_graph(start_key, end_key)
+        if start_key == end_key:
+            return ([start_key], 0.0)
+
+        data = self.a_star(start_key, end_key, heuristic)
+        if data['previous'][end_key] == '':
+            return ([''], math.inf)
+
+        path = [end_key]
+        while path[-1] != start_key:
+            path.append(data['previous'][path[-1]])
+        path.reverse()
+        return (path, data['distance'][end_key])
+
+    def tour_cost(self, path=()):
+        """Total directed cost of the legs of a path"""
+        self._validate_keys_in_graph(*path)
+        return sum(self._cost(self.keyIndex[path[i]], self.keyIndex[path[i + 1]])
+                   for i in range(len(path) - 1))
+
+    ##########################################################################################################
+
+    def nearest_neighbour(self, start_key: str = ''):
+        """Asymmetric nearest neighbour order, always moving to the cheapest unvisited successor
+
+        Stops early if no unvisited vertex has an edge from the current one.
+        """
+        self._validate_keys_in_graph(start_key)
+        is_visited = numpy.zeros(len(self.keys), dtype=bool)
+        current_index = self.keyIndex[start_key]
+        order = [current_index]
+        is_visited[current_index] = True
+
+        while len(order) < len(self.keys):
+            row = self._row(current_index)
+            row[is_visited] = math.inf
+            next_index = int(numpy.argmin(row))
+            if row[next_index] == math.inf:
+                break
+            order.append(next_index)
+            is_visited[next_index] = True
+            current_index = next_index
+
+        return [self.keys[i] for i in order]
+
+    def or_opt(self, order=(), closed: bool = True, neighbour_count: int = 8, deadline: float = None):
+        """Or-opt on a directed tour: move segments of 1 to 3 vertices, without reversing them,
+        to before one of the cheapest successors of their last vertex
+
+        For closed tours that includes the first vertex, moving the segment onto the closing leg.
+        The first vertex stays first. deadline is a time.perf_counter() value to stop at.
+        """
+        indices = [self.keyIndex[key] for key in order]
+        n = len(indices)
+        if n < 4:
+            return list(order)
+
+        neighbours = self._out_neighbours(neighbour_count)
+        position = numpy.full(len(self.keys), -1, dtype=numpy.int64)  # -1 for vertices not in the order
+        position[indices] = numpy.arange(n)
+        cost = self._cost
+
+        def successor(i):
+            return indices[i + 1] if i + 1 < n else (indices[0] if closed else None)
+
+        def leg(a, b):
+            return 0.0 if a is None or b is None else cost(a, b)
+
+        improved = True
+        while improved:
+            improved = False
+            for segment_length in (1, 2, 3):
+                i = 1
+                while i + segment_length <= n:
+                    first = indices[i]
+                    last = indices[i + segment_length - 1]
+                    before = indices[i - 1]
+                    after = successor(i + segment_length - 1)
+                    removal_gain = leg(before, first) + leg(last, after) - leg(before, after)
+
+                    moved = False
+                    if removal_gain > 1e-9:
+                        for target in neighbours[last]:
+                            target_position = position[target]
+                            if target_position < 0 or (target_position == 0 and not closed):
+                                continue
+                            # Insert between target's predecessor and target, outside the segment,
+                            # where the first vertex's predecessor is the last on the closing leg
+                            before_position = target_position - 1 if target_position > 0 else n - 1
+                            if i - 1 <= before_position <= i + segment_length - 1:
+                                continue
+                            target_before = indices[before_position]
+                            insertion_cost = leg(target_before, first) + leg(last, target) - leg(target_before, target)
+                            if insertion_cost < removal_gain - 1e-9:
+                                segment = indices[i:i + segment_length]
+                                del indices[i:i + segment_length]
+                                insert_at = indices.index(target) if target_position > 0 else len(indices)
+                                indices[insert_at:insert_at] = segment
+                                position[indices] = numpy.arange(n)
+                                improved = moved = True
+                                break
+
+                    if not moved:
+                        i += 1
+
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return [self.keys[i] for i in indices]
+
+        return [self.keys[i] for i in indices]
+
+    def atsp_tour(self, start_key: str = '', improve: bool = True, deadline: float = None):
+        """Closed tour for the asymmetric travelling salesman problem
+
+        Asymmetric nearest neighbour, then Or-opt when improve is set. The tour returns to the start
+        along the cheapest path from the last vertex, which may pass through visited vertices.
+        It leaves out vertices the nearest neighbour walk could not reach, and drops vertices from
+        the end of the order while there is no path from them back to the start.
+        """
+        order = self.nearest_neighbour(start_key)
+        if improve:
+            order = self.or_opt(order, closed=True, deadline=deadline)
+
+        while len(order) > 1:
+            data = self.a_star(order[-1], start_key)
+            if start_key in data['distance']:
+                path = [start_key]
+                while path[-1] != order[-1]:
+                    path.append(data['previous'][path[-1]])
+                return order + path[-2::-1]
+
+            # Nothing the last vertex reaches can get back either
+            while len(order) > 1 and order[-1] in data['distance']:
+                order.pop()
+
+        return order + [start_key]
+
+    def _out_neighbours(self, count: int = 8):
+        """Indices of the count cheapest successors of every vertex, computed a row at a time"""
+        if self._outNeighbours is None or self._outNeighbours.shape[1] != min(count, len(self.keys) - 1):
+            count = min(count, len(self.keys) - 1)
+            neighbours = numpy.empty((len(self.keys), count), dtype=numpy.int64)
+            for index in range(len(self.keys)):
+                row = self._row(index)
+                row[index] = math.inf
+                cheapest = numpy.argpartition(row, count - 1)[:count]
+                neighbours[index] = cheapest[numpy.argsort(row[cheapest], kind='stable')]
+            self._outNeighbours = neighbours
+        return self._outNeighbours
+
+
+class _SparseMatrix:
+    """Minimal CSR container for matrices loaded from .npz files"""
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+
+
+if __name__ == '__main__':
+    costs = numpy.array([[0, 1, 9, 4],
+                         [9, 0, 1, 9],
+                         [9, 9, 0, 1],
+                         [1, 9, 9, 0]], dtype=float)
+    graph = CostMatrixGraph(costs, 'ABCD')
+    print(graph.available_path('A', 'D'), graph.available_path('D', 'A'))
+
+    tour = graph.atsp_tour('A')
+    print(tour, graph.tour_cost(tour))
@@ -0,0 +1,69 @@
+import math
+
+import numpy
+
+
+def held_karp(distances):
+    """Optimal closed tour from vertex 0 of a distance matrix, as (visiting order, cost)
+
+    Dynamic program over subsets: cost[mask, j] is the cheapest path from vertex 0 through the
+    vertices in mask, ending at j. Subsets are bitmasks over vertices 1 to n - 1, processed in
+    layers of equal size, each layer in one numpy pass per end vertex.
+    Memory is 9 bytes per (mask, end) pair, 2^(n - 1) * (n - 1) pairs, about 90 MB for 20 vertices.
+    distances[a][b] is the cost from a to b and need not be symmetric. The order starts at 0 and
+    does not repeat it at the end, cost is inf when no tour exists.
+    """
+    distances = numpy.asarray(distances, dtype=float)
+    n = len(distances)
+    if n <= 2:
+        order = list(range(n))
+        cost = distances[0, 1] + distances[1, 0] if n == 2 else 0.0
+        return (order, float(cost))
+
+    m = n - 1  # Vertices other than 0, bit j stands for vertex j + 1
+    between = distances[1:, 1:]
+    masks = numpy.arange(1 << m)
+    sizes = numpy.zeros(1 << m, dtype=numpy.int8)
+    for bit in range(m):
+        sizes += (masks >> bit) & 1
+
+    cost = numpy.full((1 << m, m), math.inf)
+    parents = numpy.full((1 << m, m), -1, dtype=numpy.int8)
+    ends = numpy.arange(m)
+    cost[1 << ends, ends] = distances[0, 1:]
+
+    for size in range(2, m + 1):
+        layer = masks[sizes == size]
+        for end in range(m):
+            with_end = layer[(layer >> end) & 1 == 1]
+            through = cost[with_end ^ (1 << end)] + between[:, end]
+            best = numpy.argmin(through, axis=1)
+            cost[with_end, end] = through[numpy.arange(len(with_end)), best]
+            parents[with_end, end] = best
+
+    closing = cost[-1] + distances[1:, 0]
+    end = int(numpy.argmin(closing))
+    total = float(closing[end])
+    if total == math.inf:
+        return ([0], math.inf)
+
+    order = []
+    mask = (1 << m) - 1
+    while end >= 0:
+        order.append(end + 1)
+        mask, end = mask ^ (1 << end), int(parents[mask, end])
+    order.append(0)
+    order.reverse()
+    return (order, total)
+
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    rng = random.Random(0)
+    points = numpy.array([(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(14)])
+    matrix = numpy.linalg.norm(points[:, None] - points[None], axis=2)
+
+    start_time = time.perf_counter()
+    print(held_karp(matrix), time.perf_counter() - start_time)
@@ -45,6 +45,25 @@ class Graph:
         except:
             pass
 
+    def to_csr(self):
+        """Compressed sparse row adjacency (keys, indptr, indices)
+
+        The neighbours of keys[i] are keys[indices[indptr[i]:indptr[i + 1]]], in index order.
+        Neighbours that are not nodes of this graph are left out.
+        """
+        import numpy
+
+        keys = list(self.nodes)
+        key_index = dict((key, i) for i, key in enumerate(keys))
+        rows = [sorted(key_index[neighbour.key] for neighbour in self.nodes[key].neighbours
+                       if neighbour.key in key_index) for key in keys]
+
+        indptr = numpy.zeros(len(keys) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(row) for row in rows], out=indptr[1:])
+        indices = numpy.fromiter((i for row in rows for i in row),
+                                 dtype=numpy.int64, count=int(indptr[-1]))
+        return (keys, indptr, indices)
+
 
 def construct_graph(dict_graph={}):
     graph = Graph()
@@ -59,20 +78,60 @@ def construct_graph(dict_graph={}):
     return graph
 
 
-def rand_graph(n, p):
-    graph = {x: set() for x in range(n)}
-
-    for i in range(n):
-        for j in range(i + 1, n):
-            if i != j and random.random() < p:
-                graph[i].add(j)
-                graph[j].add(i)
-
-    for i in range(n):
-        newList = [j for j in graph[i]]
-        graph[i] = newList
-
-    return graph
+def from_csr(keys, indptr, indices, node_class=Node.Node):
+    """Graph from a compressed sparse row adjacency, the inverse of Graph.to_csr"""
+    nodes = [node_class(key=key) for key in keys]
+    for i, node in enumerate(nodes):
+        for j in indices[indptr[i]:indptr[i + 1]]:
+            node.add_neighbour(nodes[j])
+    return Graph(nodes)
+
+
+def rand_graph(n, p, seed=None):
+    """G(n, p) random graph as {node: [neighbours]}, see rand_graph_csr"""
+    indptr, indices = rand_graph_csr(n, p, seed)
+    return {i: indices[indptr[i]:indptr[i + 1]].tolist() for i in range(n)}
+
+
+def rand_graph_csr(n, p, seed=None):
+    """G(n, p) random graph as a symmetric CSR adjacency (indptr, indices)
+
+    Instead of testing all n(n - 1) / 2 pairs, the gaps between chosen pairs are drawn from a
+    geometric distribution, so the work is proportional to the number of edges.
+    """
+    import numpy
+
+    rng = numpy.random.default_rng(seed if seed is not None else random.getrandbits(64))
+    pair_count = n * (n - 1) // 2
+
+    if p <= 0 or pair_count == 0:
+        pairs = numpy.zeros(0, dtype=numpy.int64)
+    elif p >= 1:
+        pairs = numpy.arange(pair_count, dtype=numpy.int64)
+    else:
+        chunks = []
+        last_pair = -1
+        chunk_size = max(1024, int(pair_count * p * 1.1))
+        while last_pair < pair_count:
+            gaps = rng.geometric(p, chunk_size).astype(numpy.int64)
+            chunk = last_pair + numpy.cumsum(gaps)
+            chunks.append(chunk[chunk < pair_count])
+            last_pair = int(chunk[-1])
+        pairs = numpy.concatenate(chunks)
+
+    # Pair k lies in row i of the upper triangle when row_starts[i] <= k < row_starts[i + 1]
+    rows = numpy.arange(n, dtype=numpy.int64)
+    row_starts = rows * (2 * n - rows - 1) // 2
+    source = numpy.searchsorted(row_starts, pairs, side='right') - 1
+    target = pairs - row_starts[source] + source + 1
+
+    both_source = numpy.concatenate((source, target))
+    both_target = numpy.concatenate((target, source))
+    order = numpy.lexsort((both_target, both_source))
+
+    indptr = numpy.zeros(n + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(both_source, minlength=n), out=indptr[1:])
+    return (indptr, both_target[order])
 
 
 if __name__ == "__main__":
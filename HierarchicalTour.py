@@ -0,0 +1,198 @@
+import os
+import math
+import logging
+import concurrent.futures
+
+import numpy
+
+import LineIntersection
+import Partition
+import Pathfinder
+
+
+def hierarchical_tour(items=(), obstacles=(), start_key: str = '', cell_capacity: int = 256, max_workers: int = None):
+    """Closed tour over very large item sets, stitched together from per cell tours
+
+    items: iterable of (item_id, x_pos, y_pos)
+    obstacles: iterable of (obs_id, x_pos, y_pos, radius)
+
+    Items are split into quadtree cells of at most cell_capacity items, and every cell is solved
+    with the MST optimized tour in worker processes (max_workers = 1 solves them in this process).
+    Touring the cell centroids orders the cells. Each cell tour is then cut open next to its entry
+    item, in whichever direction gives the cheapest join to an item of the next cell. Blocked joins
+    are costed by their detour, trying exit and entry pairs from the nearest until the straight-line
+    distance of the next pair exceeds the cheapest join, or JOIN_CANDIDATE_LIMIT pairs are tried.
+    Memory stays linear in the number of items, apart from the quadratic work within each cell.
+
+    Detours only pass through the items of the cells involved. A join between two cells that has
+    no detour through either cell is made directly. Items their cell tour could not reach are left
+    out and logged as a warning.
+    """
+    items = [(str(item[0]), float(item[1]), float(item[2])) for item in items]
+    obstacles = [(str(obstacle[0]), float(obstacle[1]), float(obstacle[2]), float(obstacle[3]))
+                 for obstacle in obstacles]
+    start_key = str(start_key)
+
+    keys = [item[0] for item in items]
+    key_index = dict((key, i) for i, key in enumerate(keys))
+    if len(key_index) != len(keys):
+        raise ValueError('Item IDs must be unique')
+    if start_key not in key_index:
+        raise ValueError(f'Item with ID {start_key} does not exist')
+
+    positions = numpy.array([(item[1], item[2])
+                             for item in items], dtype=float).reshape(-1, 2)
+    obstacle_circles = numpy.array([obstacle[1:] for obstacle in obstacles],
+                                   dtype=float).reshape(-1, 3)
+
+    labels = Partition.quadtree_partition(positions, cell_capacity)
+    cell_count = int(labels.max()) + 1
+    by_cell = numpy.argsort(labels, kind='stable')
+    boundaries = numpy.searchsorted(labels[by_cell], numpy.arange(cell_count + 1))
+    cell_members = [by_cell[boundaries[cell]:boundaries[cell + 1]]
+                    for cell in range(cell_count)]
+    start_cell = int(labels[key_index[start_key]])
+
+    def cell_items(*cells):
+        return [items[i] for cell in cells for i in cell_members[cell]]
+
+    def cell_obstacles(*cells):
+        members = numpy.concatenate([cell_members[cell] for cell in cells])
+        lower = positions[members].min(axis=0)
+        upper = positions[members].max(axis=0)
+        overlaps = ((obstacle_circles[:, 0] + obstacle_circles[:, 2] >= lower[0]) &
+                    (obstacle_circles[:, 0] - obstacle_circles[:, 2] <= upper[0]) &
+                    (obstacle_circles[:, 1] + obstacle_circles[:, 2] >= lower[1]) &
+                    (obstacle_circles[:, 1] - obstacle_circles[:, 2] <= upper[1]))
+        return [obstacles[i] for i in numpy.flatnonzero(overlaps)]
+
+    # Order the cells by touring their centroids
+    centroids = [(str(cell), *positions[cell_members[cell]].mean(axis=0))
+                 for cell in range(cell_count)]
+    centroid_tour = Pathfinder.solve_route(centroids, (), str(start_cell))[0]
+    cell_order = list(dict.fromkeys(int(cell) for cell in centroid_tour))
+
+    def free_members(cell):
+        """Members outside every obstacle, an item inside one has every edge blocked"""
+        members = cell_members[cell]
+        circles = numpy.array([obstacle[1:] for obstacle in cell_obstacles(cell)], dtype=float).reshape(-1, 3)
+        is_inside = numpy.hypot(positions[members, None, 0] - circles[:, 0],
+                                positions[members, None, 1] - circles[:, 1]) <= circles[:, 2]
+        return [keys[i] for i in members[~is_inside.any(axis=1)]]
+
+    # Solve every cell independently, from a member that can leave its position
+    starts = [start_key if cell == start_cell else (free_members(cell) + [keys[cell_members[cell][0]]])[0]
+              for cell in range(cell_count)]
+    jobs = ([cell_items(cell) for cell in range(cell_count)],
+            [cell_obstacles(cell) for cell in range(cell_count)], starts)
+
+    if max_workers == 1 or cell_count == 1:
+        cell_tours = list(map(Pathfinder.solve_route, *jobs))
+    else:
+        chunk_size = max(1, cell_count // (4 * (max_workers or os.cpu_count() or 1)))
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            cell_tours = list(executor.map(
+                Pathfinder.solve_route, *jobs, chunksize=chunk_size))
+
+    # A start that reached nothing else may still be walled in, retry from the other members
+    for cell in range(cell_count):
+        if cell == start_cell or len(cell_members[cell]) == 1 or len(set(cell_tours[cell][0])) > 1:
+            continue
+        for candidate in free_members(cell):
+            if candidate != starts[cell]:
+                cell_tours[cell] = Pathfinder.solve_route(jobs[0][cell], jobs[1][cell], candidate)
+                if len(set(cell_tours[cell][0])) > 1:
+                    break
+
+    # Items a cell tour could not reach are left out, so only reached items can be entry points
+    reached_members = [numpy.array([key_index[key] for key in dict.fromkeys(tour[0])])
+                       for tour in cell_tours]
+    unreached = [keys[i] for cell in range(cell_count)
+                 for i in numpy.setdiff1d(cell_members[cell], reached_members[cell])]
+    if len(unreached) > 0:
+        logging.warning('Hierarchical tour left out %d items its cell tours could not reach: %s',
+                        len(unreached), ', '.join(unreached))
+
+    local_pathfinders = {}  # (cell a, cell b) -> Pathfinder over both cells, for detours
+
+    def join(key_a, key_b, cell_a, cell_b):
+        """(cost, waypoints after key_a that lead to key_b), the cost is inf when the join is blocked
+        and has no detour"""
+        if key_a == key_b:
+            return (0.0, [])
+
+        position_a = positions[key_index[key_a]]
+        position_b = positions[key_index[key_b]]
+        is_blocked = LineIntersection.segments_within_radius(
+            position_a[0], position_a[1], position_b[0], position_b[1],
+            obstacle_circles[:, 0], obstacle_circles[:, 1], obstacle_circles[:, 2])
+        if not numpy.any(is_blocked):
+            return (float(numpy.hypot(*(position_b - position_a))), [key_b])
+
+        cells = tuple(sorted(set((cell_a, cell_b))))
+        if cells not in local_pathfinders:
+            local = Pathfinder.Pathfinder()
+            local.add_items(cell_items(*cells))
+            local.add_obstacles(cell_obstacles(*cells))
+            local_pathfinders[cells] = local
+
+        detour, cost = local_pathfinders[cells].available_path(key_a, key_b)
+        return (math.inf, [key_b]) if detour == [''] else (cost, detour[1:])
+
+    path = [start_key]
+    entry_key = start_key
+
+    for order_index, cell in enumerate(cell_order):
+        # A closed cell tour ends where it started, drop the repeat to get a cycle
+        tour = cell_tours[cell][0]
+        cycle = tour[:-1] if len(tour) > 1 and tour[0] == tour[-1] else tour
+        entry_index = cycle.index(entry_key)
+        forward = cycle[entry_index:] + cycle[:entry_index]
+        backward = forward[:1] + forward[1:][::-1]
+
+        if order_index + 1 < len(cell_order):
+            next_cell = cell_order[order_index + 1]
+            next_members = reached_members[next_cell]
+        else:
+            next_cell = start_cell
+            next_members = numpy.array([key_index[start_key]])
+
+        # Straight-line distances bound the join costs from below, so pairs are tried from the nearest
+        candidates = (forward, backward) if len(forward) > 2 else (forward,)
+        exit_positions = positions[[key_index[candidate[-1]] for candidate in candidates]]
+        distances = numpy.hypot(positions[next_members, None, 0] - exit_positions[:, 0],
+                                positions[next_members, None, 1] - exit_positions[:, 1])
+
+        best = None
+        for pair in numpy.argsort(distances, axis=None)[:JOIN_CANDIDATE_LIMIT]:
+            member, candidate_index = numpy.unravel_index(pair, distances.shape)
+            if best is not None and distances[member, candidate_index] >= best[0]:
+                break
+
+            candidate = candidates[candidate_index]
+            cost, waypoints = join(candidate[-1], keys[next_members[member]], cell, next_cell)
+            if best is None or cost < best[0]:
+                best = (cost, candidate, waypoints)
+
+        cost, candidate, waypoints = best
+        path.extend(candidate[1:])
+        path.extend(waypoints)
+        entry_key = path[-1]
+
+    return path
+
+
+JOIN_CANDIDATE_LIMIT = 16  # Exit and entry pairs tried per join between cells
+
+
+if __name__ == '__main__':
+    import time
+
+    rng = numpy.random.default_rng(0)
+    points = rng.uniform(0, 1000, (5000, 2))
+    circles = numpy.column_stack((rng.uniform(0, 1000, (50, 2)), rng.uniform(1, 10, 50)))
+
+    start_time = time.perf_counter()
+    tour = hierarchical_tour([(str(i), x, y) for i, (x, y) in enumerate(points)],
+                             [(f'OBS{i}', x, y, r) for i, (x, y, r) in enumerate(circles)], '0')
+    print(f'{len(set(tour))} items in {time.perf_counter() - start_time:.2f} s')
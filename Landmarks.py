@@ -0,0 +1,137 @@
+import math
+
+import numpy
+
+
+class LandmarkTable:
+    """Shortest path distances from a few landmark vertices, for ALT lower bounds in A*
+
+    By the triangle inequality |d(L, v) - d(L, t)| <= d(v, t) for every landmark L, which is a much
+    tighter bound than the direct distance when obstacles force long detours. With an asymmetric
+    metric only d(L, t) - d(L, v) <= d(v, t) holds, so only that side is used.
+    Landmarks are chosen by farthest point selection in shortest path distance, and the distance
+    tables are stored as a (landmarks, vertices) array.
+    """
+
+    def __init__(self, graph=None, count: int = 8):
+        self.keys = ()
+        self.keyIndex = {}
+        self.metric = None
+        self.positions = numpy.zeros((0, 2))
+        self.landmarkIndices = []
+        self.distances = numpy.zeros((0, 0))
+        self.version = None  # Graph version the tables were built from
+        self.count = count
+
+        if graph is not None:
+            self.build(graph)
+
+    def build(self, graph):
+        keys = graph.vertex_set_tuple()
+        key_index = dict((key, i) for i, key in enumerate(keys))
+        positions = graph.position_array(keys)
+
+        blocked_adjacent = [[] for _ in keys]
+        for edge in graph.blockedEdges:
+            blocked_adjacent[key_index[edge[0]]].append(key_index[edge[1]])
+            blocked_adjacent[key_index[edge[1]]].append(key_index[edge[0]])
+
+        self.keys = keys
+        self.keyIndex = key_index
+        self.metric = graph.metric
+        self.positions = positions
+        self.landmarkIndices = []
+        tables = []
+
+        # Vertices with every edge blocked would only ever bound themselves
+        candidates = numpy.array([len(blocked) < len(keys) - 1 for blocked in blocked_adjacent])
+        if len(keys) > 0 and numpy.any(candidates):
+            # Start from the candidate farthest from the centroid, then take the vertex farthest
+            # from every landmark so far, counting unreached vertices as farthest of all
+            centroid_distances = numpy.linalg.norm(positions - positions.mean(axis=0), axis=1)
+            next_index = int(numpy.argmax(numpy.where(candidates, centroid_distances, -1)))
+            nearest_landmark = numpy.full(len(keys), math.inf)
+
+            while len(tables) < min(self.count, len(keys)):
+                self.landmarkIndices.append(next_index)
+                tables.append(_dijkstra_distances(
+                    graph.metric, positions, blocked_adjacent, next_index))
+                nearest_landmark = numpy.minimum(nearest_landmark, tables[-1])
+
+                scores = numpy.where(candidates, nearest_landmark, -1)
+                scores[self.landmarkIndices] = -1
+                next_index = int(numpy.argmax(scores))
+                if scores[next_index] <= 0:
+                    break
+
+        self.distances = numpy.array(tables, dtype=float).reshape(len(tables), len(keys))
+        self.version = graph.version
+        return self
+
+    def lower_bounds(self, target_key: str = ''):
+        """Lower bound on the distance from every vertex to the target, as an array"""
+        target_index = self.keyIndex[target_key]
+        if self.metric.obeysTriangleInequality:
+            bounds = self.metric.pairwise(self.positions, self.positions[target_index])
+        else:
+            bounds = numpy.zeros(len(self.keys))
+
+        if len(self.distances) > 0:
+            from_landmarks = self.distances
+            to_target = self.distances[:, target_index, None]
+            with numpy.errstate(invalid='ignore'):
+                landmark_bounds = to_target - from_landmarks
+                if self.metric.isSymmetric:
+                    landmark_bounds = numpy.abs(landmark_bounds)
+            # A landmark that reaches exactly one of the two proves they are disconnected,
+            # one that reaches neither says nothing. Along directed edges only reaching v but
+            # not t is proof, as v could still reach t when the landmark cannot reach v.
+            is_finite = numpy.isfinite(from_landmarks)
+            reaches_target = numpy.isfinite(to_target)
+            landmark_bounds[is_finite & ~reaches_target] = math.inf
+            landmark_bounds[~is_finite & ~reaches_target] = 0
+            landmark_bounds[~is_finite & reaches_target] = math.inf if self.metric.isSymmetric else 0
+            bounds = numpy.maximum(bounds, landmark_bounds.max(axis=0))
+
+        return bounds
+
+    def heuristic(self, target_key: str = ''):
+        """h(key) for CompleteGraph.a_star, the larger of the direct distance and landmark bounds"""
+        bounds = self.lower_bounds(target_key).tolist()
+        key_index = self.keyIndex
+        return lambda key: bounds[key_index[key]]
+
+
+def _dijkstra_distances(metric, positions, blocked_adjacent, source_index: int):
+    """Shortest path distances from one vertex of a complete graph with blocked edges"""
+    n = len(positions)
+    distances = numpy.full(n, math.inf)
+    distances[source_index] = 0
+    is_closed = numpy.zeros(n, dtype=bool)
+
+    for _ in range(n):
+        open_distances = numpy.where(is_closed, math.inf, distances)
+        current = int(numpy.argmin(open_distances))
+        if open_distances[current] == math.inf:
+            break
+        is_closed[current] = True
+
+        edge_lengths = metric.pairwise(positions[current], positions)
+        edge_lengths[blocked_adjacent[current]] = math.inf
+        numpy.minimum(distances, distances[current] + edge_lengths, out=distances)
+
+    return distances
+
+
+if __name__ == '__main__':
+    import CompleteGraph
+
+    g = CompleteGraph.CompleteGraph()
+    g.push_vertex('a', x=0, y=0)
+    g.push_vertex('b', x=0, y=10)
+    g.push_vertex('c', x=1, y=0)
+    g.block_edge('a', 'c')
+
+    table = LandmarkTable(g, 2)
+    print([table.keys[i] for i in table.landmarkIndices])
+    print(table.lower_bounds('c'))
@@ -15,7 +15,8 @@
 # delta > 0: full intersect (2 points on circumference)
 
 import math
-import numpy
+
+# numpy is only imported by the vectorized functions, the scalar tests use plain floats
 
 
 class Obstacle:
@@ -28,18 +29,14 @@ class Obstacle:
 
     def does_line_segment_intersect(self, x1=0, y1=0, x2=0, y2=0):
         # https://stackoverflow.com/questions/1073336/circle-line-segment-collision-detection-algorithm?rq=1
-        # REQUIRE NUMPY
-        # python -m pip install numpy
-
-        point_a = numpy.array([x1, y1])
-        point_b = numpy.array([x2, y2])
-        point_circle = numpy.array([self.x, self.y])
-        direction_vector = point_b - point_a
-        circle_out_vector = point_a - point_circle
+        direction_x = x2 - x1
+        direction_y = y2 - y1
+        circle_out_x = x1 - self.x
+        circle_out_y = y1 - self.y
 
-        A = numpy.dot(direction_vector, direction_vector)
-        B = numpy.dot(circle_out_vector, direction_vector) * 2
-        C = numpy.dot(circle_out_vector, circle_out_vector) - pow(self.r, 2)
+        A = direction_x * direction_x + direction_y * direction_y
+        B = (circle_out_x * direction_x + circle_out_y * direction_y) * 2
+        C = circle_out_x * circle_out_x + circle_out_y * circle_out_y - pow(self.r, 2)
 
         discrim = pow(B, 2) - (4*A*C)
 
@@ -95,6 +92,129 @@ class Obstacle:
 
         return does_segment_intersect or is_line_enveloped or at_least_once
 
+    def are_obstacles_on_edges(self, x1, y1, x2, y2):
+        """Vectorized is_obstacle_on_edge_p over arrays of segment endpoints"""
+        return segments_within_radius(x1, y1, x2, y2, self.x, self.y, self.r)
+
+
+def segments_within_radius(x1, y1, x2, y2, x_c=0, y_c=0, r=0):
+    """Determine which segments pass within radius r of the point (x_c, y_c).
+
+    Takes numpy arrays of segment endpoints and returns a boolean mask.
+    A segment is blocked by a circle exactly when the closest point on the segment
+    lies within the circle, which covers the intersect, envelope and endpoint cases
+    of is_obstacle_on_edge_p in one pass.
+    """
+    import numpy
+
+    delta_x = x2 - x1
+    delta_y = y2 - y1
+    length_squared = delta_x * delta_x + delta_y * delta_y
+    projection = (x_c - x1) * delta_x + (y_c - y1) * delta_y
+
+    # Degenerate (zero length) segments project onto their first endpoint
+    t = numpy.divide(projection, length_squared, out=numpy.zeros_like(
+        projection, dtype=float), where=length_squared > 0)
+    t = numpy.clip(t, 0, 1)
+
+    closest_x = x1 + t * delta_x - x_c
+    closest_y = y1 + t * delta_y - y_c
+    return closest_x * closest_x + closest_y * closest_y <= r * r
+
+
+class SegmentIndex:
+    """Index over every edge of a complete graph of points, for finding the edges near a circle
+
+    Positions are stored once and segments are materialized from index pairs on query,
+    so moving a point is a single row update. Segments are numbered in numpy.triu_indices order,
+    and selection arguments take a boolean mask or an array of those numbers.
+    """
+
+    def __init__(self, keys=(), positions=()):
+        import numpy
+
+        self.keys = tuple(keys)
+        self.keyIndex = dict((key, i) for i, key in enumerate(self.keys))
+        self.positions = numpy.array(
+            positions, dtype=float).reshape(len(self.keys), 2)
+        self.indexA, self.indexB = numpy.triu_indices(len(self.keys), k=1)
+
+    def __len__(self):
+        return len(self.indexA)
+
+    def set_position(self, key, x=0, y=0):
+        self.positions[self.keyIndex[key]] = (x, y)
+
+    def segment_endpoints(self, mask=None):
+        index_a = self.indexA if mask is None else self.indexA[mask]
+        index_b = self.indexB if mask is None else self.indexB[mask]
+        return (self.positions[index_a, 0], self.positions[index_a, 1],
+                self.positions[index_b, 0], self.positions[index_b, 1])
+
+    def segments_near(self, x=0, y=0, r=0):
+        """Sorted numbers of the segments passing within radius r of (x, y)
+
+        Points get an outcode of the sides of the circle's bounding box they lie beyond. Two points
+        beyond the same side cannot span a segment that reaches the box, so only pairs from outcode
+        groups without a side in common are tested, and the work grows with those candidates
+        rather than with every segment.
+        """
+        import numpy
+
+        n = len(self.keys)
+        point_x = self.positions[:, 0]
+        point_y = self.positions[:, 1]
+        codes = ((point_x < x - r) * 1 | (point_x > x + r) * 2 |
+                 (point_y < y - r) * 4 | (point_y > y + r) * 8)
+        order = numpy.argsort(codes, kind='stable')
+        groups = numpy.split(order, numpy.cumsum(numpy.bincount(codes, minlength=16))[:-1])
+
+        index_a = []
+        index_b = []
+        for code_a in range(16):
+            for code_b in range(code_a, 16):
+                group_a = groups[code_a]
+                group_b = groups[code_b]
+                if code_a & code_b != 0 or len(group_a) == 0 or len(group_b) == 0:
+                    continue
+                if code_a == code_b:
+                    pairs_a, pairs_b = numpy.triu_indices(len(group_a), k=1)
+                    index_a.append(group_a[pairs_a])
+                    index_b.append(group_a[pairs_b])
+                else:
+                    index_a.append(numpy.repeat(group_a, len(group_b)))
+                    index_b.append(numpy.tile(group_b, len(group_a)))
+
+        if len(index_a) == 0:
+            return numpy.zeros(0, dtype=numpy.int64)
+
+        index_a = numpy.concatenate(index_a).astype(numpy.int64)
+        index_b = numpy.concatenate(index_b).astype(numpy.int64)
+        low = numpy.minimum(index_a, index_b)
+        high = numpy.maximum(index_a, index_b)
+
+        is_near = segments_within_radius(self.positions[low, 0], self.positions[low, 1],
+                                         self.positions[high, 0], self.positions[high, 1], x, y, r)
+        low = low[is_near]
+        high = high[is_near]
+        # Segment number of (low, high) in numpy.triu_indices order
+        return numpy.sort(low * (2 * n - low - 1) // 2 + high - low - 1)
+
+    def segments_blocked(self, obstacles=(), mask=None):
+        """Boolean mask, over the selected segments, of those blocked by at least one obstacle"""
+        import numpy
+
+        x1, y1, x2, y2 = self.segment_endpoints(mask)
+        is_blocked = numpy.zeros(len(x1), dtype=bool)
+        for obstacle in obstacles:
+            is_blocked |= obstacle.are_obstacles_on_edges(x1, y1, x2, y2)
+        return is_blocked
+
+    def edges(self, mask=None):
+        index_a = self.indexA if mask is None else self.indexA[mask]
+        index_b = self.indexB if mask is None else self.indexB[mask]
+        return [(self.keys[a], self.keys[b]) for a, b in zip(index_a, index_b)]
+
 
 if __name__ == '__main__':
     pass
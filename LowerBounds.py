@@ -0,0 +1,163 @@
+import math
+
+import numpy
+
+# Lower bounds on the cost of any closed tour through a set of vertices, for telling how far
+# a heuristic tour could still improve. The MST also bounds open paths, the 1-tree does not.
+
+
+def mst_weight(graph, keys=None):
+    """Weight of a minimum spanning tree over the direct distances between the keys
+
+    Dropping one leg of a closed tour leaves a spanning tree, as does any open path through the
+    keys, so neither is shorter than the MST. Blocked edges are ignored, as the direct distance never exceeds a detour for metrics
+    that obey the triangle inequality. Other metrics give no bound and return 0.
+    """
+    keys = graph.vertex_set_tuple() if keys is None else tuple(keys)
+    if len(keys) < 2 or not graph.metric.obeysTriangleInequality:
+        return 0.0
+
+    positions = graph.position_array(keys)
+    return float(_prim(lambda index: _edge_lengths(graph.metric, positions, index), len(keys))[1].sum())
+
+
+def one_tree_bound(graph, keys=None, iterations: int = 50, upper_bound: float = None):
+    """Held-Karp lower bound from 1-trees with subgradient optimization, at least the MST weight
+
+    A 1-tree is an MST of every vertex but the first, plus the two cheapest edges of the first.
+    Every tour is a 1-tree, so for any vertex penalties pi the 1-tree weight under the distances
+    d(i, j) + pi[i] + pi[j], less 2 * sum(pi), bounds the tour cost. Each iteration moves pi
+    along the vertex degrees minus 2, with steps sized by upper_bound, a known tour cost,
+    or that of the MST shortcut tour without one. The best of the iterations is returned.
+    Distances are as for mst_weight, and are held as an n by n array for up to MATRIX_LIMIT keys.
+    """
+    keys = graph.vertex_set_tuple() if keys is None else tuple(keys)
+    n = len(keys)
+    if n < 3 or not graph.metric.obeysTriangleInequality:
+        return 2 * mst_weight(graph, keys)  # There and back for two keys
+
+    positions = graph.position_array(keys)
+    if n <= MATRIX_LIMIT:
+        distances = graph.metric.pairwise(positions[:, None, :], positions[None, :, :])
+        if not graph.metric.isSymmetric:
+            distances = numpy.minimum(distances, distances.T)
+        lengths = distances.__getitem__
+    else:
+        def lengths(index):
+            return _edge_lengths(graph.metric, positions, index)
+
+    if upper_bound is None:
+        upper_bound = _shortcut_tour_cost(_prim(lengths, n)[0], lengths, n)
+
+    pi = numpy.zeros(n)
+    best_bound = 0.0
+    step_scale = 2.0
+    stalled = 0
+
+    for _ in range(iterations):
+        weight, degrees = _one_tree(lambda index: lengths(index) + pi[index] + pi, n)
+        bound = weight - 2 * pi.sum()
+
+        if bound > best_bound + 1e-9:
+            best_bound = bound
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled >= 5:
+                step_scale /= 2
+                stalled = 0
+
+        subgradient = degrees - 2
+        norm = float(subgradient @ subgradient)
+        if norm == 0 or upper_bound <= bound:
+            break  # The 1-tree is a tour, or the bound has met the tour cost
+        pi += step_scale * (upper_bound - bound) / norm * subgradient
+
+    return float(best_bound)
+
+
+def optimality_gap(cost: float = 0, lower_bound: float = 0):
+    """How much longer a tour is than a lower bound, relative to the bound, inf without a bound
+
+    A negative gap means the bound does not hold for the tour, such as a 1-tree bound on an open path.
+    """
+    if lower_bound <= 0:
+        return 0.0 if cost <= 0 else math.inf
+    return (cost - lower_bound) / lower_bound
+
+
+MATRIX_LIMIT = 3000  # Keys above which one_tree_bound recomputes distance rows instead of storing them
+
+
+def _edge_lengths(metric, positions, index: int):
+    """Direct distances from one position to all, the cheaper direction for asymmetric metrics"""
+    lengths = metric.pairwise(positions[index], positions)
+    if not metric.isSymmetric:
+        lengths = numpy.minimum(lengths, metric.pairwise(positions, positions[index]))
+    return lengths
+
+
+def _prim(lengths, n: int, first: int = 0):
+    """MST of vertices first to n - 1 by dense Prim, as (edges, weights) arrays
+
+    lengths(index) gives the edge lengths from a vertex to every vertex.
+    """
+    is_in_tree = numpy.zeros(n, dtype=bool)
+    is_in_tree[:first] = True
+    nearest = numpy.full(n, math.inf)
+    parents = numpy.full(n, -1)
+    edges = []
+    weights = []
+    current = first
+
+    for _ in range(n - first - 1):
+        is_in_tree[current] = True
+        current_lengths = lengths(current)
+        is_closer = current_lengths < nearest
+        nearest[is_closer] = current_lengths[is_closer]
+        parents[is_closer] = current
+
+        candidates = numpy.where(is_in_tree, math.inf, nearest)
+        current = int(numpy.argmin(candidates))
+        edges.append((parents[current], current))
+        weights.append(candidates[current])
+
+    return (numpy.array(edges, dtype=int).reshape(-1, 2), numpy.array(weights, dtype=float))
+
+
+def _shortcut_tour_cost(edges, lengths, n: int):
+    """Cost of the closed tour visiting the MST from vertex 0 in depth first preorder"""
+    children = [[] for _ in range(n)]
+    for parent, child in edges.tolist():
+        children[parent].append(child)
+
+    order = []
+    stack = [0]
+    while len(stack) > 0:
+        order.append(stack.pop())
+        stack.extend(reversed(children[order[-1]]))
+
+    order.append(0)
+    return float(sum(lengths(order[i])[order[i + 1]] for i in range(n)))
+
+
+def _one_tree(lengths, n: int):
+    """(weight, vertex degrees) of the 1-tree on vertex 0"""
+    edges, weights = _prim(lengths, n, first=1)
+    first_lengths = lengths(0)[1:]
+    cheapest = numpy.argpartition(first_lengths, 1)[:2]
+
+    degrees = numpy.bincount(edges.ravel(), minlength=n)
+    degrees[0] = 2
+    degrees[cheapest + 1] += 1
+    return (weights.sum() + first_lengths[cheapest].sum(), degrees)
+
+
+if __name__ == '__main__':
+    import CompleteGraph
+
+    g = CompleteGraph.CompleteGraph()
+    for key, x, y in (('a', 0, 0), ('b', 3, 0), ('c', 3, 4), ('d', 0, 4)):
+        g.push_vertex(key, x=x, y=y)
+
+    print(mst_weight(g), one_tree_bound(g), optimality_gap(14, one_tree_bound(g)))
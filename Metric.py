@@ -0,0 +1,176 @@
+import math
+
+# Distance functions between vertex positions, each with a scalar form for single edges
+# and a vectorized numpy kernel for whole arrays of positions.
+
+
+class Metric:
+    """Base metric, subclasses define distance and pairwise
+
+    obeysTriangleInequality marks metrics where the direct distance between two positions never
+    exceeds the length of any path between them. Only those metrics can guide A* and let the
+    path oracle skip unblocked pairs; otherwise both fall back to searching without a bound.
+    isSymmetric marks metrics where distance(a, b) == distance(b, a).
+    Metrics of the same class compare equal, so caches keyed by metric are shared between
+    instances. Subclasses with parameters compare them in _identity.
+    """
+
+    name = ''
+    obeysTriangleInequality = True
+    isSymmetric = True
+
+    def distance(self, position_a=(0, 0), position_b=(0, 0)):
+        raise NotImplementedError
+
+    def pairwise(self, positions_a, positions_b):
+        """Distances between position arrays of shape (..., dimensions), broadcast against each other"""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._identity() == other._identity()
+
+    def __hash__(self):
+        return hash((type(self), self._identity()))
+
+    def _identity(self):
+        return ()
+
+
+class Euclidean(Metric):
+    name = 'euclidean'
+
+    def distance(self, position_a=(0, 0), position_b=(0, 0)):
+        if len(position_a) == 2:
+            return math.hypot(position_a[0] - position_b[0], position_a[1] - position_b[1])
+        return math.sqrt(sum((a - b) ** 2 for a, b in zip(position_a, position_b)))
+
+    def pairwise(self, positions_a, positions_b):
+        import numpy
+
+        delta = numpy.asarray(positions_a, dtype=float) - numpy.asarray(positions_b, dtype=float)
+        return numpy.sqrt(numpy.einsum('...i,...i->...', delta, delta))
+
+
+class Manhattan(Metric):
+    name = 'manhattan'
+
+    def distance(self, position_a=(0, 0), position_b=(0, 0)):
+        return float(sum(abs(a - b) for a, b in zip(position_a, position_b)))
+
+    def pairwise(self, positions_a, positions_b):
+        import numpy
+
+        return numpy.abs(numpy.asarray(positions_a, dtype=float) - numpy.asarray(positions_b, dtype=float)).sum(axis=-1)
+
+
+class Chebyshev(Metric):
+    name = 'chebyshev'
+
+    def distance(self, position_a=(0, 0), position_b=(0, 0)):
+        return float(max((abs(a - b) for a, b in zip(position_a, position_b)), default=0))
+
+    def pairwise(self, positions_a, positions_b):
+        import numpy
+
+        return numpy.abs(numpy.asarray(positions_a, dtype=float) - numpy.asarray(positions_b, dtype=float)).max(axis=-1)
+
+
+class CallableMetric(Metric):
+    """Any function of two position tuples, with no assumptions about it"""
+
+    obeysTriangleInequality = False
+    isSymmetric = False
+
+    def __init__(self, function, obeys_triangle_inequality: bool = False, symmetric: bool = False):
+        self.function = function
+        self.name = getattr(function, '__name__', 'callable')
+        self.obeysTriangleInequality = obeys_triangle_inequality
+        self.isSymmetric = symmetric
+
+    def distance(self, position_a=(0, 0), position_b=(0, 0)):
+        return float(self.function(tuple(position_a), tuple(position_b)))
+
+    def _identity(self):
+        return (self.function, self.obeysTriangleInequality, self.isSymmetric)
+
+    def pairwise(self, positions_a, positions_b):
+        import numpy
+
+        positions_a = numpy.asarray(positions_a, dtype=float)
+        positions_b = numpy.asarray(positions_b, dtype=float)
+        shape = numpy.broadcast(positions_a[..., 0], positions_b[..., 0]).shape
+        positions_a = numpy.broadcast_to(positions_a, shape + positions_a.shape[-1:])
+        positions_b = numpy.broadcast_to(positions_b, shape + positions_b.shape[-1:])
+
+        distances = numpy.empty(shape)
+        for index in numpy.ndindex(shape):
+            distances[index] = self.distance(positions_a[index], positions_b[index])
+        return distances
+
+
+class CostMatrix(Metric):
+    """Costs looked up in a matrix, with a position of (row index,) for every vertex
+
+    Lets arbitrary travel costs, such as time weighted ones, run through the same algorithms.
+    Arrays are used as given, without copying, and nested lists are converted to one.
+    matrix[a][b] is the cost from a to b, which may differ from the cost back. For thousands of
+    vertices use CostMatrixGraph instead, which works on the matrix a row at a time.
+    """
+
+    name = 'cost matrix'
+    isSymmetric = False
+
+    def __init__(self, matrix, obeys_triangle_inequality: bool = False, symmetric: bool = False):
+        if not hasattr(matrix, 'shape'):
+            import numpy
+
+            matrix = numpy.asarray(matrix, dtype=float)
+        self.matrix = matrix
+        self.obeysTriangleInequality = obeys_triangle_inequality
+        self.isSymmetric = symmetric
+
+    def distance(self, position_a=(0,), position_b=(0,)):
+        return float(self.matrix[int(position_a[0]), int(position_b[0])])
+
+    def _identity(self):
+        # Comparing matrices costs as much as the work being cached, the same matrix object is equal
+        return (id(self.matrix), self.obeysTriangleInequality, self.isSymmetric)
+
+    def pairwise(self, positions_a, positions_b):
+        import numpy
+
+        rows = numpy.asarray(positions_a)[..., 0].astype(numpy.int64)
+        columns = numpy.asarray(positions_b)[..., 0].astype(numpy.int64)
+        rows, columns = numpy.broadcast_arrays(rows, columns)
+        return numpy.asarray(self.matrix[rows, columns], dtype=float)
+
+
+METRICS = {'euclidean': Euclidean, 'manhattan': Manhattan, 'chebyshev': Chebyshev}
+
+
+def get_metric(metric=None):
+    """Metric from None (euclidean), a name in METRICS, a Metric, or a function of two positions"""
+    if metric is None:
+        return Euclidean()
+    if isinstance(metric, Metric):
+        return metric
+    if isinstance(metric, str):
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric}')
+        return METRICS[metric]()
+    if callable(metric):
+        return CallableMetric(metric)
+    raise ValueError(f'Unsupported metric {metric}')
+
+
+if __name__ == '__main__':
+    for metric_name in METRICS:
+        metric = get_metric(metric_name)
+        print(metric, metric.distance((0, 0, 0), (1, 2, 3)),
+              metric.pairwise([(0, 0, 0), (1, 1, 1)], [(1, 2, 3)]))
+
+    matrix = CostMatrix([[0, 4], [7, 0]])
+    print(matrix.distance((0,), (1,)), matrix.distance((1,), (0,)))
@@ -70,10 +70,12 @@ class CartesianNode(Node):
     def dimensions(self):
         return len(self.value)
 
-    def euclidian_distance(self, dim_zip):
+    @staticmethod
+    def euclidian_distance(dim_zip):
         return math.sqrt(sum(pow(abs(dim_pair[0] - dim_pair[1]), 2) for dim_pair in dim_zip))
 
-    def manhattan_distance(self, dim_zip):
+    @staticmethod
+    def manhattan_distance(dim_zip):
         return sum(abs(dim_pair[0] - dim_pair[1]) for dim_pair in dim_zip)
 
     def distance(self, node, dim_compare=None):
@@ -0,0 +1,164 @@
+import math
+
+import numpy
+
+# Spatial partitioning of point sets, used to split items between vehicles or solver cells.
+# Positions are (n, 2) arrays and partitions are returned as integer label arrays.
+
+
+def farthest_point_indices(positions, count: int = 1, first_index: int = 0):
+    """Greedy farthest point selection, starting from first_index"""
+    positions = numpy.asarray(positions, dtype=float)
+    count = min(count, len(positions))
+    if count <= 0:
+        return []
+
+    selected = [first_index]
+    distances = numpy.hypot(*(positions - positions[first_index]).T)
+
+    while len(selected) < count:
+        next_index = int(numpy.argmax(distances))
+        selected.append(next_index)
+        distances = numpy.minimum(distances, numpy.hypot(
+            *(positions - positions[next_index]).T))
+
+    return selected
+
+
+def balanced_kmeans(positions, depot_indices=(), iterations: int = 10):
+    """k-means seeded at the depots where every cluster holds at most ceil(n / k) points
+
+    Each depot stays in its own cluster. Points are assigned in order of regret, the gap between
+    their nearest and second nearest centre, so the points with the most to lose choose first.
+    """
+    positions = numpy.asarray(positions, dtype=float)
+    depot_indices = list(depot_indices)
+    k = len(depot_indices)
+    n = len(positions)
+
+    if k == 0:
+        raise ValueError('At least one depot is required')
+    if k == 1:
+        return numpy.zeros(n, dtype=int)
+
+    capacity = math.ceil(n / k)
+    centres = positions[depot_indices].copy()
+    labels = numpy.zeros(n, dtype=int)
+
+    for _ in range(iterations):
+        distances = numpy.hypot(positions[:, None, 0] - centres[None, :, 0],
+                                positions[:, None, 1] - centres[None, :, 1])
+        preference = numpy.argsort(distances, axis=1)
+        sorted_distances = numpy.take_along_axis(distances, preference, axis=1)
+        regret = sorted_distances[:, 1] - sorted_distances[:, 0]
+
+        new_labels = numpy.full(n, -1, dtype=int)
+        load = numpy.zeros(k, dtype=int)
+        for cluster, depot_index in enumerate(depot_indices):
+            new_labels[depot_index] = cluster
+            load[cluster] += 1
+
+        for point in numpy.argsort(-regret, kind='stable'):
+            if new_labels[point] != -1:
+                continue
+            for cluster in preference[point]:
+                if load[cluster] < capacity:
+                    new_labels[point] = cluster
+                    load[cluster] += 1
+                    break
+
+        if numpy.array_equal(new_labels, labels):
+            break
+
+        labels = new_labels
+        for cluster in range(k):
+            centres[cluster] = positions[labels == cluster].mean(axis=0)
+
+    return labels
+
+
+def sweep_partition(positions, depot_indices=()):
+    """Split points into equal sized angular sectors around their centroid, one per depot"""
+    positions = numpy.asarray(positions, dtype=float)
+    depot_indices = list(depot_indices)
+    k = len(depot_indices)
+    n = len(positions)
+
+    if k == 0:
+        raise ValueError('At least one depot is required')
+
+    centroid = positions.mean(axis=0)
+    angles = numpy.arctan2(positions[:, 1] - centroid[1],
+                           positions[:, 0] - centroid[0])
+    order = numpy.argsort(angles, kind='stable')
+
+    sectors = numpy.empty(n, dtype=int)
+    sectors[order] = numpy.arange(n) * k // n
+
+    # Give each sector to the closest unclaimed depot, then move every depot into its own sector
+    sector_centres = numpy.array(
+        [positions[sectors == sector].mean(axis=0) for sector in range(k)])
+    unclaimed = set(range(k))
+    sector_depot = {}
+    for sector in range(k):
+        closest = min(unclaimed, key=lambda cluster: math.hypot(
+            *(positions[depot_indices[cluster]] - sector_centres[sector])))
+        sector_depot[sector] = closest
+        unclaimed.remove(closest)
+
+    labels = numpy.array([sector_depot[sector] for sector in sectors], dtype=int)
+    for cluster, depot_index in enumerate(depot_indices):
+        labels[depot_index] = cluster
+
+    return labels
+
+
+def quadtree_partition(positions, capacity: int = 256, max_depth: int = 32):
+    """Split the bounding box into quadrants until every cell holds at most capacity points
+
+    Cells are numbered in depth first order. Cells at max_depth may exceed the capacity,
+    which only happens for heavily duplicated positions.
+    """
+    positions = numpy.asarray(positions, dtype=float)
+    labels = numpy.zeros(len(positions), dtype=int)
+    if len(positions) == 0:
+        return labels
+
+    lower = positions.min(axis=0)
+    upper = positions.max(axis=0)
+    stack = [(numpy.arange(len(positions)), lower, upper, 0)]
+    cell = 0
+
+    while len(stack) > 0:
+        indices, lower, upper, depth = stack.pop()
+
+        if len(indices) <= capacity or depth >= max_depth:
+            labels[indices] = cell
+            cell += 1
+            continue
+
+        middle = (lower + upper) / 2
+        is_right = positions[indices, 0] > middle[0]
+        is_top = positions[indices, 1] > middle[1]
+
+        for right in (False, True):
+            for top in (False, True):
+                quadrant = indices[(is_right == right) & (is_top == top)]
+                if len(quadrant) > 0:
+                    quadrant_lower = numpy.where(
+                        (right, top), middle, lower)
+                    quadrant_upper = numpy.where(
+                        (right, top), upper, middle)
+                    stack.append((quadrant, quadrant_lower,
+                                  quadrant_upper, depth + 1))
+
+    return labels
+
+
+if __name__ == '__main__':
+    points = numpy.random.default_rng(0).uniform(0, 100, (20, 2))
+    depots = farthest_point_indices(points, 3)
+    print(depots)
+    print(balanced_kmeans(points, depots))
+    print(sweep_partition(points, depots))
+    print(quadtree_partition(points, 4))
@@ -1,43 +1,284 @@
-import copy
+import os
 import math
+import time
 import bisect
 import operator
+import functools
+import threading
+import contextlib
 
 import CompleteGraph
 import LineIntersection
+import SpatialHash
+import TourCache
+
+# numpy, and the modules built on it, are imported where they are first needed so that
+# creating a pathfinder and touring unobstructed items does not pay for loading numpy
+
+EXACT_TOUR_LIMIT = 18  # Most items auto_tour solves exactly, the exact solver takes about 0.3 s at 18
+
+
+def _mutation(method):
+    """Serialize a mutating method between editor threads and reject it on snapshots"""
+
+    @functools.wraps(method)
+    def locked_method(self, *args, **kwargs):
+        self._validate_mutable()
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return locked_method
 
 
 class Pathfinder:
 
-    def __init__(self):
-        self.itemGraph = CompleteGraph.CompleteGraph()
+    def __init__(self, spatial_cell_size: float = 32.0, metric=None):
+        """metric sets the travel cost between items, see CompleteGraph, obstacles still block straight lines"""
+        self.itemGraph = CompleteGraph.CompleteGraph(metric)
         self.obstacleDict = dict()
-
+        self._batchDepth = 0
+        self._blockedEdgesStale = False
+        self.timeToFirstWaypoint = None  # Seconds until the last streamed tour produced its first waypoint
+
+        # Copy-on-write state, see snapshot()
+        self._lock = threading.RLock()
+        self._isFrozen = False
+        self._isObstacleDictShared = False
+        self._obstacleVersion = 0
+        self._snapshot = None
+
+        self._segmentIndex = None  # Built on demand, dropped when the item set changes
+        self._tourArrays = None  # (graph version, key index, positions, blocked edge codes), see _get_tour_arrays
+        self._lowerBounds = (None, {})  # (graph version, {(keys, iterations): (mst, one tree or None)}), see tour_bounds
+
+        # Closed tours by map content, shared with snapshots and copies, None to disable
+        self.tourCache = TourCache.TourCache()
+
+        # Built on the first nearest query, then kept in sync with every mutation
+        self.spatialCellSize = spatial_cell_size
+        self._itemHash = None
+        self._obstacleHash = None
+
+    @_mutation
     def clear(self):
-        self.itemGraph = CompleteGraph.CompleteGraph()
+        path_oracle_enabled = self.itemGraph.pathOracleEnabled
+        self.itemGraph = CompleteGraph.CompleteGraph(self.itemGraph.metric)
+        self.itemGraph.pathOracleEnabled = path_oracle_enabled
         self.obstacleDict = dict()
+        self._isObstacleDictShared = False
+        self._obstacleVersion += 1
+        self._batchDepth = 0  # Ends any batch in progress, later mutations in it apply immediately
+        self._blockedEdgesStale = False
+        self._segmentIndex = None
+        self._itemHash = None
+        self._obstacleHash = None
+
+    def snapshot(self):
+        """Immutable view of the current version for lock free queries
+
+        Readers on any thread can query a snapshot while an editor keeps mutating this pathfinder.
+        Snapshots share containers with the live pathfinder until a mutation touches them, and
+        repeated calls without intervening mutations return the same snapshot.
+        """
+        if self._isFrozen:
+            return self
+
+        with self._lock:
+            snapshot_key = (self.itemGraph.version, self._obstacleVersion)
+
+            if self._snapshot is None or self._snapshot[0] != snapshot_key:
+                pathfinder_snapshot = Pathfinder(self.spatialCellSize)
+                pathfinder_snapshot.itemGraph = self.itemGraph.snapshot()
+                pathfinder_snapshot.obstacleDict = self.obstacleDict
+                pathfinder_snapshot._blockedEdgesStale = self._blockedEdgesStale
+                pathfinder_snapshot._obstacleVersion = self._obstacleVersion
+                pathfinder_snapshot._isFrozen = True
+                pathfinder_snapshot.tourCache = self.tourCache
+                self._isObstacleDictShared = True
+                self._snapshot = (snapshot_key, pathfinder_snapshot)
+
+            return self._snapshot[1]
+
+    def copy(self):
+        """Independent mutable copy, use snapshot() when only queries are needed"""
+        with self._lock:
+            pathfinder_copy = Pathfinder(self.spatialCellSize)
+            pathfinder_copy.itemGraph = self.itemGraph.copy()
+            pathfinder_copy.obstacleDict = dict(self.obstacleDict)
+            pathfinder_copy._blockedEdgesStale = self._blockedEdgesStale
+            pathfinder_copy.tourCache = self.tourCache
+            return pathfinder_copy
+
+    def enable_path_oracle(self, enabled: bool = True, cache_file: str = None):
+        """Answer path queries, including those made while building tours, from a PathOracle
+
+        The oracle is rebuilt on the first query after the items or blocked edges change.
+        cache_file is a file written by save_path_oracle, used instead of the first build when
+        it matches the current map.
+        """
+        with self._lock:
+            oracle = None
+            if enabled and cache_file is not None and os.path.exists(cache_file):
+                import PathOracle
+
+                try:
+                    oracle = PathOracle.PathOracle.load(cache_file, self.itemGraph)
+                except ValueError:
+                    oracle = None  # Saved for another map, build afresh on the first query
+            self.itemGraph.enable_path_oracle(enabled, oracle)
+
+    def save_path_oracle(self, cache_file: str):
+        self.itemGraph.path_oracle().save(cache_file)
+
+    def graph_version(self):
+        """Changes whenever items or blocked edges change, use to key cached results"""
+        return self.itemGraph.version
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Defer blocked edge maintenance until the outermost batch exits
+
+        with pathfinder.batch():
+            pathfinder.add_item('A', x_pos=0, y_pos=0)
+            pathfinder.add_obstacle('OBS', 1, 1, 0.5)
+
+        Queries made inside the batch see stale blocked edges. Other threads
+        cannot mutate or take snapshots until the batch exits. clear() ends
+        every batch in progress.
+        """
+        self._validate_mutable()
+        with self._lock:
+            self._batchDepth += 1
+            try:
+                yield self
+            finally:
+                self._batchDepth = max(0, self._batchDepth - 1)
+                if self._batchDepth == 0 and self._blockedEdgesStale:
+                    self._blockable_difference()
 
     ########################################################################
 
+    @_mutation
     def add_item(self, item_id: str = 'A', item_value=None, x_pos: float = 0, y_pos: float = 0):
         if item_id == '':
             raise ValueError('Item ID cannot be the empty string')
 
         self._validate_item_nonexistence(item_id)
         self.itemGraph.push_vertex(item_id, item_value, x_pos, y_pos)
-        self._blockable_difference()
+        self._segmentIndex = None
+        if self._itemHash is not None:
+            self._itemHash.insert(str(item_id), x_pos, y_pos)
+        self._update_blocked_edges()
 
+    @_mutation
     def remove_item(self, item_id: str = ''):
         self._validate_item_existence(item_id)
         self.itemGraph.pop_vertex(item_id)
+        self._segmentIndex = None
+        if self._itemHash is not None:
+            self._itemHash.remove(str(item_id))
         # No need to take difference as pop already removes blocked edges
 
+    @_mutation
+    def add_items(self, items=()):
+        """Add many items with a single blocked edge recomputation
+
+        items: iterable of (item_id, x_pos, y_pos) or (item_id, x_pos, y_pos, item_value)
+        The whole batch is validated before any item is added.
+        """
+        items = [tuple(item) for item in items]
+        errors = []
+        batch_ids = set()
+
+        for item in items:
+            if len(item) not in (3, 4):
+                errors.append(f'Item {item} is not of the form (id, x, y[, value])')
+                continue
+            item_id = str(item[0])
+            if item_id == '':
+                errors.append('Item ID cannot be the empty string')
+            elif self.has_item(item_id) or item_id in batch_ids:
+                errors.append(f'Item with ID {item_id} already exists')
+            try:
+                float(item[1])
+                float(item[2])
+            except (TypeError, ValueError):
+                errors.append(f'Item {item_id} has an invalid position')
+            batch_ids.add(item_id)
+
+        self._raise_batch_errors(errors)
+
+        with self.batch():
+            for item in items:
+                item_value = item[3] if len(item) == 4 else None
+                self.add_item(str(item[0]), item_value, item[1], item[2])
+
+    @_mutation
+    def remove_items(self, item_ids=()):
+        item_ids = [str(item_id) for item_id in item_ids]
+        errors = [f'Item with ID {item_id} does not exist'
+                  for item_id in item_ids if not self.has_item(item_id)]
+        if len(set(item_ids)) != len(item_ids):
+            errors.append('Item IDs to remove contain duplicates')
+        self._raise_batch_errors(errors)
+
+        with self.batch():
+            for item_id in item_ids:
+                self.remove_item(item_id)
+
+    @_mutation
+    def move_item(self, item_id: str = '', x_pos: float = 0, y_pos: float = 0):
+        """Move an item, re-testing only its own n - 1 edges against the obstacles
+
+        Returns the set of edges whose blocked state changed. Inside a batch the update is
+        deferred to the end of the batch and None is returned.
+        """
+        self._validate_item_existence(item_id)
+        item_id = str(item_id)
+        self.itemGraph.set_position(item_id, x_pos, y_pos)
+        if self._segmentIndex is not None:
+            self._segmentIndex.set_position(item_id, x_pos, y_pos)
+        if self._itemHash is not None:
+            self._itemHash.move(item_id, x_pos, y_pos)
+
+        if self._batchDepth > 0 or self._blockedEdgesStale:
+            return self._update_blocked_edges()
+
+        import numpy
+
+        vertex_keys = self.itemGraph.vertex_set_tuple()
+        item_index = vertex_keys.index(item_id)
+        # Orient edges as (earlier key, later key) like the full recomputation does
+        edges = [(key, item_id) if i < item_index else (item_id, key)
+                 for i, key in enumerate(vertex_keys) if i != item_index]
+        other_positions = numpy.array([self.itemGraph.get_position(key)
+                                       for key in vertex_keys if key != item_id], dtype=float).reshape(-1, 2)
+        item_position = self.itemGraph.get_position(item_id)
+        x1 = numpy.full(len(other_positions), item_position[0])
+        y1 = numpy.full(len(other_positions), item_position[1])
+
+        is_blocked = numpy.zeros(len(other_positions), dtype=bool)
+        for obstacle in self.obstacleDict.values():
+            is_blocked |= obstacle.are_obstacles_on_edges(
+                x1, y1, other_positions[:, 0], other_positions[:, 1])
+
+        return self._apply_blocked_mask(edges, is_blocked)
+
     def has_item(self, item_id: str):
         return self.itemGraph.has_vertex(item_id)
 
     def item_position(self, id_item: str):
         return self.itemGraph.get_position(id_item)
 
+    def nearest_item(self, x_pos: float = 0, y_pos: float = 0, max_distance: float = math.inf):
+        """ID of the item closest to the point and within max_distance of it, or None"""
+        if self._itemHash is None:
+            item_hash = SpatialHash.SpatialHash(self.spatialCellSize)
+            for key in self.itemGraph.vertex_set_tuple():
+                item_hash.insert(key, *self.itemGraph.get_position(key))
+            self._itemHash = item_hash
+        return self._itemHash.nearest(x_pos, y_pos, max_distance)
+
     def item_distance(self, item_id_1: str, item_id_2: str):
         self._validate_item_existence(item_id_1, item_id_2)
         return self.itemGraph.get_distance(item_id_1, item_id_2)
@@ -51,24 +292,114 @@ class Pathfinder:
 
     ########################################################################
 
+    @_mutation
     def add_obstacle(self, obs_id: str = 'A', x_pos: float = 0, y_pos: float = 0, radius: float = 0):
         obs_id = str(obs_id)
         if not self.has_obstacle(obs_id):
             obstacle_object = LineIntersection.Obstacle(
                 x_pos, y_pos, radius)
+            self._prepare_obstacle_write()
             self.obstacleDict[obs_id] = obstacle_object
-            self._blockable_difference()
+            if self._obstacleHash is not None:
+                self._obstacleHash.insert(obs_id, x_pos, y_pos)
+            self._update_blocked_edges()
         else:
             raise ValueError(f'Obstacle {obs_id} already exists')
 
+    @_mutation
     def remove_obstacle(self, obs_id: str = 'A'):
         obs_id = str(obs_id)
         if self.has_obstacle(obs_id):
+            self._prepare_obstacle_write()
             del self.obstacleDict[obs_id]
-            self._blockable_difference()
+            if self._obstacleHash is not None:
+                self._obstacleHash.remove(obs_id)
+            self._update_blocked_edges()
         else:
             raise ValueError(f'Obstacle{obs_id} does not exist')
 
+    @_mutation
+    def move_obstacle(self, obs_id: str = 'A', x_pos: float = 0, y_pos: float = 0, radius: float = None):
+        """Move (and optionally resize) an obstacle without a full blocked edge recomputation
+
+        Only edges passing through the old or the new footprint are re-tested, found with
+        LineIntersection.SegmentIndex.segments_near.
+        Returns the set of edges whose blocked state changed. Inside a batch the update is
+        deferred to the end of the batch and None is returned.
+        """
+        obs_id = str(obs_id)
+        if not self.has_obstacle(obs_id):
+            raise ValueError(f'Obstacle{obs_id} does not exist')
+
+        old_obstacle = self.obstacleDict[obs_id]
+        radius = old_obstacle.r if radius is None else radius
+        new_obstacle = LineIntersection.Obstacle(x_pos, y_pos, radius)
+        self._prepare_obstacle_write()
+        self.obstacleDict[obs_id] = new_obstacle
+        if self._obstacleHash is not None:
+            self._obstacleHash.move(obs_id, x_pos, y_pos)
+
+        if self._batchDepth > 0 or self._blockedEdgesStale:
+            return self._update_blocked_edges()
+
+        segment_index = self._get_segment_index()
+        if len(segment_index) == 0:
+            return set()
+
+        import numpy
+
+        candidates = numpy.union1d(segment_index.segments_near(old_obstacle.x, old_obstacle.y, old_obstacle.r),
+                                   segment_index.segments_near(new_obstacle.x, new_obstacle.y, new_obstacle.r))
+        return self._apply_blocked_mask(segment_index.edges(candidates),
+                                        segment_index.segments_blocked(self.obstacleDict.values(), candidates))
+
+    @_mutation
+    def add_obstacles(self, obstacles=()):
+        """Add many obstacles with a single blocked edge recomputation
+
+        obstacles: iterable of (obs_id, x_pos, y_pos, radius)
+        The whole batch is validated before any obstacle is added.
+        """
+        obstacles = [tuple(obstacle) for obstacle in obstacles]
+        errors = []
+        batch_ids = set()
+
+        for obstacle in obstacles:
+            if len(obstacle) != 4:
+                errors.append(
+                    f'Obstacle {obstacle} is not of the form (id, x, y, radius)')
+                continue
+            obs_id = str(obstacle[0])
+            if self.has_obstacle(obs_id) or obs_id in batch_ids:
+                errors.append(f'Obstacle {obs_id} already exists')
+            try:
+                float(obstacle[1])
+                float(obstacle[2])
+                float(obstacle[3])
+            except (TypeError, ValueError):
+                errors.append(f'Obstacle {obs_id} has an invalid position or radius')
+            batch_ids.add(obs_id)
+
+        self._raise_batch_errors(errors)
+
+        with self.batch():
+            for obstacle in obstacles:
+                self.add_obstacle(str(obstacle[0]), float(obstacle[1]),
+                                  float(obstacle[2]), float(obstacle[3]))
+
+    @_mutation
+    def remove_obstacles(self, obs_ids=()):
+        obs_ids = [str(obs_id) for obs_id in obs_ids]
+        errors = [f'Obstacle{obs_id} does not exist'
+                  for obs_id in obs_ids if not self.has_obstacle(obs_id)]
+        if len(set(obs_ids)) != len(obs_ids):
+            errors.append('Obstacle IDs to remove contain duplicates')
+        self._raise_batch_errors(errors)
+
+        with self.batch():
+            for obs_id in obs_ids:
+                self.remove_obstacle(obs_id)
+
     def has_obstacle(self, obs_id: str = 'A'):
         obs_id = str(obs_id)
         return obs_id in self.obstacleDict
@@ -78,6 +409,15 @@ class Pathfinder:
         if self.has_obstacle(obs_id):
             return (self.obstacleDict[obs_id].x, self.obstacleDict[obs_id].y, self.obstacleDict[obs_id].r)
 
+    def nearest_obstacle(self, x_pos: float = 0, y_pos: float = 0, max_distance: float = math.inf):
+        """ID of the obstacle whose centre is closest to the point and within max_distance of it, or None"""
+        if self._obstacleHash is None:
+            obstacle_hash = SpatialHash.SpatialHash(self.spatialCellSize)
+            for key, obstacle in self.obstacleDict.items():
+                obstacle_hash.insert(key, obstacle.x, obstacle.y)
+            self._obstacleHash = obstacle_hash
+        return self._obstacleHash.nearest(x_pos, y_pos, max_distance)
+
     def obstacle_keys(self):
         return list(key for key in self.obstacleDict)
 
@@ -93,6 +433,40 @@ class Pathfinder:
             if self.has_item(str(item_key)):
                 raise ValueError(f'Item with ID {item_key} already exists')
 
+    def _validate_mutable(self):
+        if self._isFrozen:
+            raise RuntimeError('Pathfinder snapshots are read only')
+
+    def _prepare_obstacle_write(self):
+        if self._isObstacleDictShared:
+            self.obstacleDict = dict(self.obstacleDict)
+            self._isObstacleDictShared = False
+        self._obstacleVersion += 1
+
+    def _raise_batch_errors(self, errors):
+        if len(errors) > 0:
+            raise ValueError('Invalid batch:\n' + '\n'.join(errors))
+
+    def _update_blocked_edges(self):
+        """Set of edges whose blocked state changed, None inside a batch where the update is deferred"""
+        if self._batchDepth > 0:
+            self._blockedEdgesStale = True
+            return None
+        return self._blockable_difference()
+
+    def _apply_blocked_mask(self, edges=(), is_blocked=()):
+        """Block or unblock each edge to match its flag, returning the set of edges that changed"""
+        changed_edges = set()
+        for edge, blocked in zip(edges, is_blocked):
+            if blocked != self.itemGraph.is_edge_blocked(edge[0], edge[1]):
+                if blocked:
+                    self.itemGraph.block_edge(edge[0], edge[1])
+                else:
+                    self.itemGraph.unblock_edge(edge[0], edge[1])
+                changed_edges.add(edge)
+
+        return changed_edges
+
     # @DeprecationWarning
     def _blockable_edges(self):
         vertex_keys = self.itemGraph.vertex_set_tuple()
@@ -170,20 +544,34 @@ class Pathfinder:
 
         return tuple(blocked_edges)
 
-    def _blockable_difference(self):
+    def _get_segment_index(self):
+        segment_index = self._segmentIndex
+        if segment_index is None:
+            vertex_keys = self.itemGraph.vertex_set_tuple()
+            segment_index = LineIntersection.SegmentIndex(
+                vertex_keys, [self.itemGraph.get_position(key) for key in vertex_keys])
+            self._segmentIndex = segment_index
+        return segment_index
 
-        # If there are no obstacles, don't go through the loops
-        # if not bool(self.obstacleDict):
-        #     return
+    def _vectorized_blockable_edges(self):
+        """Same edge set as _blockable_edges, testing every edge against one obstacle at a time with numpy"""
+        if self.itemGraph.vertex_count() < 2 or len(self.obstacleDict) == 0:
+            return tuple()
 
-        current_blocked = copy.deepcopy(self.itemGraph.blockedEdges)
-        current_blockable = self._blockable_edges()
+        segment_index = self._get_segment_index()
+        is_blocked = segment_index.segments_blocked(self.obstacleDict.values())
+        return tuple(segment_index.edges(is_blocked))
+
+    def _blockable_difference(self):
+        self._blockedEdgesStale = False
+
+        current_blocked = set(self.itemGraph.blockedEdges)
+        current_blockable = set(self._vectorized_blockable_edges())
+        # current_blockable = self._blockable_edges()
         # current_blockable = self._sweep_blockable_edges()
 
-        to_remove = filter(
-            lambda edge: edge in current_blocked and edge not in current_blockable, current_blocked)
-        to_add = filter(
-            lambda edge: edge in current_blockable and edge not in current_blocked, current_blockable)
+        to_remove = current_blocked - current_blockable
+        to_add = current_blockable - current_blocked
 
         for removable_edge in to_remove:
             self.itemGraph.unblock_edge(removable_edge[0], removable_edge[1])
@@ -191,19 +579,22 @@ class Pathfinder:
         for blockable_edge in to_add:
             self.itemGraph.block_edge(blockable_edge[0], blockable_edge[1])
 
+        return to_remove | to_add
+
     ########################################################################
 
     def dijkstra(self, start_key: str = ''):
         self._validate_item_existence(start_key)
         return self.itemGraph.dijkstra(start_key)
 
-    def available_path(self, start_key: str = '', end_key: str = ''):
+    def available_path(self, start_key: str = '', end_key: str = '', strategy: str = None):
+        """strategy is 'a_star', 'alt', 'bidirectional', 'dijkstra' or 'oracle', see CompleteGraph.available_path"""
         self._validate_item_existence(start_key, end_key)
-        return self.itemGraph.available_path(start_key, end_key)
+        return self.itemGraph.available_path(start_key, end_key, strategy)
 
-    def exists_path(self, start_key: str = '', end_key: str = ''):
+    def exists_path(self, start_key: str = '', end_key: str = '', strategy: str = None):
         self._validate_item_existence(start_key, end_key)
-        return self.itemGraph.exists_path(start_key, end_key)
+        return self.itemGraph.exists_path(start_key, end_key, strategy)
 
     def all_reachable(self, start_key: str = '', max_distance: float = math.inf):
         self._validate_item_existence(start_key)
@@ -226,42 +617,521 @@ class Pathfinder:
     # This is the algorithm described by Matt DeVos which approximates the Hamiltonian travelling salesman
     def mst_euler_tour(self, start_key: str = ''):
         self._validate_item_existence(start_key)
-        return {start_key: self.itemGraph.euler_tour_by_mst(start_key)}
+        start_key = str(start_key)
+        return {start_key: list(self._cached_tour_generator(
+            'mst_euler_tour', start_key, self.itemGraph.euler_tour_by_mst_generator(start_key)))}
 
     def mst_optimized_tour(self, start_key: str = ''):
+        return list(self.mst_optimized_tour_generator(start_key))
+
+    def mst_optimized_tour_generator(self, start_key: str = ''):
+        """Yield the optimized tour waypoint by waypoint, including A* detours
+
+        Backtracking through the MST Euler tour is replaced by a move from the last yielded
+        waypoint to the next unvisited vertex, so only the visited set is kept in memory.
+        Close the generator to cancel the remaining computation.
+        Tours that run to the end are kept in the tour cache.
+        """
         self._validate_item_existence(start_key)
+        start_key = str(start_key)
+        yield from self._cached_tour_generator(
+            'mst_optimized_tour', start_key, self._optimized_tour_generator(start_key))
 
-        tour = self.itemGraph.euler_tour_by_mst(start_key)
-        is_visited = set()
-        path = []
-        inflection_point = None
+    def _optimized_tour_generator(self, start_key: str = ''):
+        order = self._first_visits(
+            self.itemGraph.euler_tour_by_mst_generator(start_key))
+        last_key = yield from self._expand_order_generator(order, time.perf_counter())
+
+        # Return to start
+        if last_key is not None and last_key != start_key:
+            yield from self.itemGraph.available_path(last_key, start_key)[0][1:]
+
+    def _cached_tour_generator(self, algorithm: str = '', start_key: str = '', tour_generator=()):
+        """Yield a closed tour from the tour cache, or from tour_generator and cache it if it runs to the end"""
+        if self.tourCache is None:
+            yield from tour_generator
+            return
+
+        start_time = time.perf_counter()
+        cache_key = (algorithm, start_key, self.itemGraph.metric, self.itemGraph.fingerprint())
+        tour = self.tourCache.get(*cache_key)
+        if tour is not None:
+            self.timeToFirstWaypoint = time.perf_counter() - start_time
+            yield from tour
+            return
+
+        tour = []
+        for key in tour_generator:
+            tour.append(key)
+            yield key
+        self.tourCache.put(*cache_key, tour, closed=True)
+
+    def exact_tour(self, start_key: str = '', limit: int = 20):
+        """Shortest closed tour from the start, by the Held-Karp dynamic program, see ExactTour
+
+        Runs over the shortest path distances around blocked edges, and skips items that cannot
+        be reached from the start and back. Time and memory double with every item, so more than
+        limit items raise ValueError.
+        """
+        self._validate_item_existence(start_key)
+        start_key = str(start_key)
+        if len(self.itemGraph.vertexDict) > limit:
+            raise ValueError(f'Exact tours are limited to {limit} items')
+
+        return list(self._cached_tour_generator('exact_tour', start_key, self._exact_tour_generator(start_key)))
+
+    def _exact_tour_generator(self, start_key: str = ''):
+        import numpy
+        import ExactTour
+
+        oracle = self.itemGraph.path_oracle()
+        start_index = oracle.keyIndex[start_key]
+        indices = [start_index] + [i for i in range(len(oracle.keys)) if i != start_index and
+                                   oracle.distances[start_index, i] < math.inf and oracle.distances[i, start_index] < math.inf]
+
+        order = ExactTour.held_karp(oracle.distances[numpy.ix_(indices, indices)])[0]
+        yield from self.expand_order([oracle.keys[indices[i]] for i in order], closed=True)
+
+    def auto_tour(self, start_key: str = '', exact_limit: int = EXACT_TOUR_LIMIT):
+        """exact_tour for up to exact_limit items, mst_optimized_tour for more"""
+        if len(self.itemGraph.vertexDict) <= exact_limit:
+            return self.exact_tour(start_key)
+        return self.mst_optimized_tour(start_key)
+
+    def anytime_tour(self, start_key: str = '', time_budget: float = 0.2, target_gap: float = None, callback=None):
+        """Closed tour that keeps improving in the background for time_budget seconds, see AnytimePlanner
+
+        Returns the running planner, whose best() is the MST shortcut tour until it improves.
+        target_gap: stop early once the tour is within this fraction of the MST lower bound.
+        callback: called with (tour, cost) on the planner thread after every improvement.
+        """
+        import AnytimePlanner
+
+        self._validate_item_existence(start_key)
+        return AnytimePlanner.AnytimePlanner(self, start_key, time_budget, target_gap, callback)
+
+    def expand_order(self, order=(), closed: bool = True):
+        """Waypoints visiting the keys in order, detouring around blocked moves and skipping
+        unreachable keys, returning to the first key when closed"""
+        tour = list(self._expand_order_generator([str(key) for key in order]))
+        if closed and len(tour) > 0 and tour[-1] != tour[0]:
+            tour.extend(self.itemGraph.available_path(tour[-1], tour[0])[0][1:])
+        return tour
+
+    def mst_open_tour(self, start_key: str = '', end_key: str = '', improve: bool = True):
+        """Open path visiting every item from the start, without returning to it
+
+        end_key: optionally fix the item the path must finish at.
+        improve: run endpoint aware 2-opt over the visiting order before expanding detours.
+        """
+        if not improve:
+            return list(self.mst_open_tour_generator(start_key, end_key))
+
+        order = list(self._open_tour_order(start_key, end_key))
+        order = self.itemGraph.two_opt_order(
+            order, closed=False, fixed_end=str(end_key) != '')
+        return list(self._expand_order_generator(order))
+
+    def mst_open_tour_generator(self, start_key: str = '', end_key: str = ''):
+        """Streaming version of mst_open_tour, without the improvement pass"""
+        yield from self._expand_order_generator(self._open_tour_order(start_key, end_key), time.perf_counter())
+
+    def _open_tour_order(self, start_key: str = '', end_key: str = ''):
+        self._validate_item_existence(start_key)
+        start_key = str(start_key)
+        end_key = str(end_key)
+
+        if end_key == '':
+            yield from self._first_visits(self.itemGraph.euler_tour_by_mst_generator(start_key))
+            return
+
+        self._validate_item_existence(end_key)
+        if end_key == start_key:
+            raise ValueError('An open tour cannot end where it starts')
 
-        for i, key in enumerate(tour):
+        # The end key's branch is descended last, so holding the end key back until
+        # everything else is visited only shortcuts its own subtree
+        for key in self._first_visits(self.itemGraph.euler_tour_by_mst_generator(start_key, end_key)):
+            if key != end_key:
+                yield key
+        yield end_key
 
+    def _first_visits(self, tour):
+        is_visited = set()
+        for key in tour:
             if key not in is_visited:
                 is_visited.add(key)
-                if inflection_point is None:
-                    path.append(key)
-                else:
-                    if self.is_direct_move_possible(inflection_point, key):
-                        path.append(key)
-                    else:
-                        path.extend(self.itemGraph.available_path(
-                            inflection_point, key)[0][1:])
-                    inflection_point = None
-
-                # If the key ahead is already visited, jump to the next unvisited key
-                if i < len(tour) - 1:
-                    key_ahead = tour[i + 1]
-                    if key_ahead in is_visited:
-                        inflection_point = key
+                yield key
 
-        # Return to start
-        if len(path) > 1:
-            path.extend(self.itemGraph.available_path(
-                path[-1], start_key)[0][1:])
+    def _expand_order_generator(self, order, start_time: float = None):
+        """Yield waypoints visiting the keys in order, detouring around blocked moves
+
+        Unreachable keys are skipped. Returns the last key reached.
+        start_time: time.perf_counter() value used to record timeToFirstWaypoint.
+        """
+        last_key = None
+
+        for key in order:
+            if last_key is None:
+                if start_time is not None:
+                    self.timeToFirstWaypoint = time.perf_counter() - start_time
+                yield key
+            elif self.is_direct_move_possible(last_key, key):
+                yield key
+            else:
+                detour = self.itemGraph.available_path(last_key, key)[0]
+                if detour == ['']:
+                    continue  # Unreachable, keep moving from the last waypoint
+                yield from detour[1:]
+
+            last_key = key
+
+        return last_key
+
+    ########################################################################
 
-        return path
+    def multi_vehicle_tours(self, depot_keys=(), strategy: str = 'kmeans', max_workers: int = None, balance_iterations: int = 3,
+                            executor=None):
+        """Split the items between vehicles starting at the depots and plan a closed tour for each
+
+        strategy: 'kmeans' (capacity balanced k-means seeded at the depots) or 'sweep' (angular sectors)
+        Routes are solved in parallel worker processes, max_workers = 1 solves them in this process.
+        executor: a concurrent.futures executor to solve routes in instead, such as a process pool
+                  kept for repeated calls.
+        Each balancing iteration hands the items of the longest route that lie closer to another
+        cluster over to it, and keeps the change only if the longest route gets shorter.
+        Routes only detour through items of their own cluster. Items a route cannot reach, such as
+        those of a depot enclosed by an obstacle, are handed to the nearest depot that can reach
+        them, and items no depot can reach are left out.
+        Worker processes need a picklable metric, use max_workers = 1 for one built from a lambda.
+
+        Returns {depot_key: (path, cost)}
+        """
+        import concurrent.futures
+        import numpy
+
+        depot_keys = [str(key) for key in depot_keys]
+        self._validate_item_existence(*depot_keys)
+        if len(depot_keys) == 0 or len(set(depot_keys)) != len(depot_keys):
+            raise ValueError('Depots must be one or more distinct items')
+
+        vertex_keys = self.itemGraph.vertex_set_tuple()
+        key_index = dict((key, i) for i, key in enumerate(vertex_keys))
+        positions = numpy.array([self.itemGraph.get_position(key)
+                                 for key in vertex_keys], dtype=float)
+        depot_indices = [key_index[key] for key in depot_keys]
+
+        # can_reach[cluster, i]: item i may belong to the cluster, cleared for the items a
+        # depot reaches in the whole graph but its route missed
+        can_reach = self._reachable_items(depot_keys)
+        depot_distances = numpy.hypot(positions[:, None, 0] - positions[depot_indices, 0],
+                                      positions[:, None, 1] - positions[depot_indices, 1])
+        labels = _reassign_unreachable(self._partition_items(positions, depot_indices, strategy),
+                                       can_reach, depot_distances)
+
+        obstacles = [(key, obstacle.x, obstacle.y, obstacle.r)
+                     for key, obstacle in self.obstacleDict.items()]
+
+        if executor is not None:
+            executor_context = contextlib.nullcontext(executor)
+        elif len(depot_keys) > 1 and max_workers != 1:
+            executor_context = concurrent.futures.ProcessPoolExecutor(max_workers)
+        else:
+            executor_context = contextlib.nullcontext()
+
+        with executor_context as executor:
+            solve = functools.partial(_solve_vehicle_routes, executor, vertex_keys, positions, obstacles,
+                                      depot_keys, self.itemGraph.metric)
+            routes = solve(range(len(depot_keys)), labels)
+            labels, routes = _hand_over_missed_items(solve, labels, routes, can_reach, depot_distances, vertex_keys)
+            for _ in range(balance_iterations if len(depot_keys) > 1 else 0):
+                balanced = _balance_routes(solve, labels, routes, can_reach, positions, depot_indices)
+                if balanced is None:
+                    break
+                labels, routes = balanced
+
+        return dict((depot_keys[cluster], routes[cluster]) for cluster in range(len(depot_keys)))
+
+    def _partition_items(self, positions, depot_indices=(), strategy: str = 'kmeans'):
+        """Cluster label of every item, one cluster per depot, see multi_vehicle_tours"""
+        import Partition
+
+        if strategy == 'kmeans':
+            return Partition.balanced_kmeans(positions, depot_indices)
+        elif strategy == 'sweep':
+            return Partition.sweep_partition(positions, depot_indices)
+        raise ValueError(f'Unknown partition strategy {strategy}')
+
+    def _reachable_items(self, start_keys=()):
+        """Boolean array of the items each start key can reach, as rows over vertex_set_tuple()"""
+        import numpy
+
+        key_index, positions, blocked_codes = self._get_tour_arrays()
+        n = len(key_index)
+        index_a, index_b = numpy.divmod(blocked_codes, n)
+        sources = numpy.concatenate((index_a, index_b))
+        targets = numpy.concatenate((index_b, index_a))[numpy.argsort(sources, kind='stable')]
+        blocked_adjacent = numpy.split(targets, numpy.cumsum(numpy.bincount(sources, minlength=n))[:-1])
+
+        reachable = numpy.zeros((len(start_keys), n), dtype=bool)
+        for row, start_key in enumerate(start_keys):
+            start_index = key_index[start_key]
+            earlier = numpy.flatnonzero(reachable[:row, start_index])
+            if len(earlier) > 0:
+                reachable[row] = reachable[earlier[0]]  # Reachability is symmetric
+                continue
+
+            # Breadth first by levels: an item joins once it is not blocked from the whole frontier
+            is_reached = reachable[row]
+            is_reached[start_index] = True
+            frontier = [start_index]
+            while len(frontier) > 0:
+                blocked = numpy.concatenate([blocked_adjacent[index] for index in frontier])
+                blocked_counts = numpy.bincount(blocked, minlength=n)
+                frontier = numpy.flatnonzero(~is_reached & (blocked_counts < len(frontier))).tolist()
+                is_reached[frontier] = True
+
+        return reachable
+
+    def hierarchical_tour(self, start_key: str = '', cell_capacity: int = 256, max_workers: int = None):
+        """Closed tour built from independently solved quadtree cells, see HierarchicalTour
+
+        Trades tour quality for near linear scaling on very large item sets.
+        """
+        import HierarchicalTour
+
+        self._validate_item_existence(start_key)
+        items = [(key, *self.itemGraph.get_position(key))
+                 for key in self.itemGraph.vertex_set_tuple()]
+        obstacles = [(key, obstacle.x, obstacle.y, obstacle.r)
+                     for key, obstacle in self.obstacleDict.items()]
+        return HierarchicalTour.hierarchical_tour(items, obstacles, start_key, cell_capacity, max_workers)
+
+    def tour_cost(self, path=()):
+        """Total length of the legs of a path, inf if any leg is a blocked edge"""
+        return float(self.tour_costs([path])[0])
+
+    def tour_costs(self, paths=()):
+        """Costs of many candidate paths at once, as a numpy array
+
+        All legs of all paths are measured in one pass over the coordinate array.
+        """
+        import numpy
+
+        key_index, positions, blocked_codes = self._get_tour_arrays()
+        paths = [list(path) for path in paths]
+        for key in set(key for path in paths for key in path):
+            if key not in key_index:
+                raise ValueError(f'Item with ID {key} does not exist')
+
+        lengths = numpy.array([len(path) for path in paths], dtype=int)
+        indices = numpy.array([key_index[key] for path in paths for key in path], dtype=int)
+        path_ids = numpy.repeat(numpy.arange(len(paths)), lengths)
+
+        # A leg joins consecutive entries of the same path
+        is_leg = path_ids[1:] == path_ids[:-1]
+        index_a = indices[:-1][is_leg]
+        index_b = indices[1:][is_leg]
+
+        leg_costs = self.itemGraph.metric.pairwise(positions[index_a], positions[index_b])
+        leg_costs[numpy.isin(self._edge_codes(index_a, index_b, len(key_index)), blocked_codes)] = math.inf
+
+        return numpy.bincount(path_ids[1:][is_leg], weights=leg_costs, minlength=len(paths))
+
+    def tour_bounds(self, tour=None, held_karp_iterations: int = 50):
+        """Lower bounds on the cost of a tour, as {'mst', 'one_tree', 'gap'}, see LowerBounds
+
+        With a tour the bounds cover the items it visits, and 'gap' is its optimality gap to the
+        tighter bound. Without one they cover every item and 'gap' is None.
+        The 1-tree only bounds closed tours, so for an open path 'one_tree' is None and the gap is
+        to the MST, which bounds both.
+        Bounds are kept for each item set until the graph version changes.
+        """
+        import LowerBounds
+
+        cost = None
+        closed = True
+        if tour is None:
+            keys = tuple(sorted(self.itemGraph.vertex_set_tuple()))
+        else:
+            cost = self.tour_cost(tour)
+            keys = tuple(sorted(set(tour)))
+            closed = len(tour) > 0 and tour[0] == tour[-1]
+
+        version, bounds = self._lowerBounds
+        if version != self.itemGraph.version:
+            bounds = {}
+            self._lowerBounds = (self.itemGraph.version, bounds)
+
+        bounds_key = (keys, held_karp_iterations)
+        if bounds_key not in bounds:
+            bounds[bounds_key] = (LowerBounds.mst_weight(self.itemGraph, keys), None)
+
+        mst, one_tree = bounds[bounds_key]
+        if closed and one_tree is None:
+            upper_bound = cost if cost is not None and cost < math.inf else None
+            one_tree = LowerBounds.one_tree_bound(self.itemGraph, keys, held_karp_iterations, upper_bound)
+            bounds[bounds_key] = (mst, one_tree)
+        elif not closed:
+            one_tree = None
+
+        return {'mst': mst, 'one_tree': one_tree,
+                'gap': None if cost is None else LowerBounds.optimality_gap(cost, mst if one_tree is None else max(mst, one_tree))}
+
+    def validate_tour(self, path=(), closed: bool = False):
+        """Problems with a path as a tour of every item, an empty list when it is valid
+
+        A valid tour visits every item, only uses unblocked edges, and ends where it started
+        when closed is set.
+        """
+        import numpy
+
+        key_index, positions, blocked_codes = self._get_tour_arrays()
+        path = list(path)
+        problems = []
+
+        unknown = [key for key in dict.fromkeys(path) if key not in key_index]
+        problems.extend(f'Item with ID {key} does not exist' for key in unknown)
+
+        visited = set(path)
+        missing = [key for key in key_index if key not in visited]
+        problems.extend(f'Item with ID {key} is not visited' for key in missing)
+
+        if closed and len(path) > 0 and path[0] != path[-1]:
+            problems.append(f'Tour ends at {path[-1]} instead of its start {path[0]}')
+
+        indices = numpy.array([key_index.get(key, -1) for key in path], dtype=int)
+        if len(indices) > 1:
+            index_a = indices[:-1]
+            index_b = indices[1:]
+            is_blocked = (index_a >= 0) & (index_b >= 0) & numpy.isin(
+                self._edge_codes(index_a, index_b, len(key_index)), blocked_codes)
+            problems.extend(f'Leg {path[i]} to {path[i + 1]} uses a blocked edge'
+                            for i in numpy.flatnonzero(is_blocked))
+
+        return problems
+
+    def _get_tour_arrays(self):
+        """Item coordinates and blocked edges as arrays, rebuilt when the graph version changes"""
+        import numpy
+
+        tour_arrays = self._tourArrays
+        if tour_arrays is None or tour_arrays[0] != self.itemGraph.version:
+            vertex_keys = self.itemGraph.vertex_set_tuple()
+            key_index = dict((key, i) for i, key in enumerate(vertex_keys))
+            positions = self.itemGraph.position_array(vertex_keys)
+            blocked = numpy.array([(key_index[edge[0]], key_index[edge[1]])
+                                   for edge in self.itemGraph.blockedEdges], dtype=int).reshape(-1, 2)
+            tour_arrays = (self.itemGraph.version, key_index, positions,
+                           numpy.unique(self._edge_codes(blocked[:, 0], blocked[:, 1], len(vertex_keys))))
+            self._tourArrays = tour_arrays
+
+        return tour_arrays[1:]
+
+    def _edge_codes(self, index_a, index_b, vertex_count: int = 0):
+        """One integer per undirected edge between item indices"""
+        import numpy
+
+        return numpy.minimum(index_a, index_b).astype(numpy.int64) * vertex_count + numpy.maximum(index_a, index_b)
+
+
+def _solve_vehicle_routes(executor, vertex_keys, positions, obstacles, depot_keys, metric, clusters, labels):
+    """{cluster: (path, cost)} of the routes of the given clusters, in the executor when there is one"""
+    import numpy
+
+    jobs = {}
+    for cluster in clusters:
+        items = [(vertex_keys[i], positions[i][0], positions[i][1])
+                 for i in numpy.flatnonzero(labels == cluster)]
+        arguments = (items, obstacles, depot_keys[cluster], metric)
+        jobs[cluster] = executor.submit(solve_route, *arguments) if executor is not None \
+            else solve_route(*arguments)
+    return dict((cluster, job.result() if executor is not None else job) for cluster, job in jobs.items())
+
+
+def _reassign_unreachable(labels, can_reach, depot_distances):
+    """Labels with every item its cluster cannot reach moved to the nearest cluster that can"""
+    import numpy
+
+    labels = labels.copy()
+    for i in numpy.flatnonzero(~can_reach[labels, numpy.arange(len(labels))]):
+        candidates = numpy.where(can_reach[:, i], depot_distances[i], math.inf)
+        if candidates.min() < math.inf:
+            labels[i] = int(numpy.argmin(candidates))
+    return labels
+
+
+def _hand_over_missed_items(solve, labels, routes, can_reach, depot_distances, vertex_keys):
+    """(labels, routes) with the items a route missed handed to other clusters, whose routes are re-solved
+
+    Routes only detour within their cluster, so an item its depot reaches may still be missed.
+    can_reach is updated in place.
+    """
+    for _ in range(len(can_reach)):
+        missed = [i for i in range(len(vertex_keys)) if can_reach[labels[i], i] and
+                  vertex_keys[i] not in routes[labels[i]][0]]
+        if len(missed) == 0:
+            break
+        changed = set(int(labels[i]) for i in missed)
+        can_reach[labels[missed], missed] = False
+        labels = _reassign_unreachable(labels, can_reach, depot_distances)
+        changed |= set(int(labels[i]) for i in missed)
+        routes = dict(routes)
+        routes.update(solve(changed, labels))
+    return (labels, routes)
+
+
+def _balance_routes(solve, labels, routes, can_reach, positions, depot_indices):
+    """(labels, routes) after handing items of the longest route to closer clusters, None if that does
+    not shorten the longest route"""
+    import numpy
+
+    cluster_count = len(depot_indices)
+    costs = [routes[cluster][1] for cluster in range(cluster_count)]
+    longest = int(numpy.argmax(costs))
+
+    centres = numpy.array([positions[labels == cluster].mean(axis=0)
+                           for cluster in range(cluster_count)])
+    members = numpy.array([i for i in numpy.flatnonzero(labels == longest)
+                           if i not in depot_indices], dtype=int)
+    if len(members) == 0:
+        return None
+
+    centre_distances = numpy.hypot(positions[members, None, 0] - centres[None, :, 0],
+                                   positions[members, None, 1] - centres[None, :, 1])
+    own_distances = centre_distances[:, longest].copy()
+    centre_distances[:, longest] = math.inf
+    centre_distances[~can_reach[:, members].T] = math.inf
+    receivers = numpy.argmin(centre_distances, axis=1)
+    ratios = centre_distances[numpy.arange(len(members)), receivers] / \
+        numpy.maximum(own_distances, 1e-12)
+
+    transfer_count = max(1, len(members) // 10)
+    transfers = [i for i in numpy.argsort(ratios)[:transfer_count] if ratios[i] < 1.5]
+    if len(transfers) == 0:
+        return None
+
+    trial_labels = labels.copy()
+    trial_labels[members[transfers]] = receivers[transfers]
+    changed = set([longest]) | set(int(receivers[i]) for i in transfers)
+    trial_routes = dict(routes)
+    trial_routes.update(solve(changed, trial_labels))
+
+    if max(route[1] for route in trial_routes.values()) < max(costs):
+        return (trial_labels, trial_routes)
+    return None
+
+
+def solve_route(items=(), obstacles=(), start_key: str = '', metric=None):
+    """Closed optimized tour of a standalone sub-problem, picklable for worker processes
+
+    Returns (path, cost)
+    """
+    pathfinder = Pathfinder(metric=metric)
+    pathfinder.add_items(items)
+    pathfinder.add_obstacles(obstacles)
+    path = pathfinder.mst_optimized_tour(start_key)
+    return (path, pathfinder.tour_cost(path))
 
 
 if __name__ == '__main__':
@@ -302,21 +1172,6 @@ if __name__ == '__main__':
 
     # branch_opttour = branch_test.mst_optimized_tour('A')
     # print(f'Branch Test OPTTOUR: {branch_opttour}')
-    # cost = 0
-
-    # for i in range(len(branch_opttour['A']) - 1):
-    #     cost += branch_test.item_distance(
-    #         branch_opttour['A'][i], branch_opttour['A'][i + 1])
-
-    # print(f'Optimal tour cost: {cost}')
-
-    # def sequence_weight(seq, pather):
-    #     weight = 0.0
-    #     for i in range(len(seq) - 1):
-    #         weight += pather.item_distance(seq[i], seq[i + 1])
-    #     return weight
 
-    # print(sequence_weight(branch_opttour['A'], branch_test))
-    # print(sequence_weight(branch_mstet['A'], branch_test))
-    # print(sequence_weight(branch_et['A'], branch_test))
-    # print(sequence_weight(branch_nn['A'], branch_test))
+    # print(branch_test.tour_costs([branch_opttour, branch_mstet, branch_et, branch_nn]))
+    # print(branch_test.validate_tour(branch_opttour, closed=True))
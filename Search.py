@@ -2,91 +2,196 @@ import Node
 import Graph
 import heapq
 import math
+import itertools
+from collections import deque
 
 
 def depth_first_search(graph, start_node, goal_node):
+    """Path from start_node to goal_node along the depth first search tree, or None"""
+    came_from = depth_first_parents(graph, start_node, goal_node)
+    return _tree_path(came_from, start_node, goal_node)
 
-    frontier = [start_node]
-    visited = set()
 
-    path = []
+def breadth_first_search(graph, start_node, goal_node):
+    """Path from start_node to goal_node with the fewest edges, or None"""
+    came_from = breadth_first_parents(graph, start_node, goal_node)
+    return _tree_path(came_from, start_node, goal_node)
+
+
+def depth_first_parents(graph, start_node, goal_node=None):
+    """{node: parent} for the nodes reached by a depth first search, in the form of reconstruct_path
+
+    O(V + E): nodes are marked when popped, so every edge is pushed at most once.
+    Stops once goal_node is reached, or visits everything reachable when it is None.
+    """
+    came_from = {}
+    frontier = [(start_node, None)]
 
     while len(frontier) > 0:
-        current_node = frontier.pop()
-        path.append(current_node)
+        current_node, parent_node = frontier.pop()
+        if current_node in came_from:
+            continue
+
+        came_from[current_node] = parent_node
         if current_node == goal_node:
-            return path
+            break
+
+        for neighbour_node in current_node.neighbours:
+            if neighbour_node not in came_from:
+                frontier.append((neighbour_node, current_node))
+
+    return came_from
+
 
-        visited.add(current_node)
+def breadth_first_parents(graph, start_node, goal_node=None):
+    """{node: parent} for the nodes reached by a breadth first search, see depth_first_parents"""
+    came_from = {start_node: None}
+    frontier = deque([start_node])
+
+    while len(frontier) > 0 and goal_node not in came_from:
+        current_node = frontier.popleft()
 
         for neighbour_node in current_node.neighbours:
-            if neighbour_node not in frontier and neighbour_node not in visited:
+            if neighbour_node not in came_from:
+                came_from[neighbour_node] = current_node
                 frontier.append(neighbour_node)
 
+    return came_from
+
+
+def _tree_path(came_from, start_node, goal_node):
+    if goal_node not in came_from:
+        return None
+
+    path = [goal_node]
+    while path[-1] != start_node:
+        path.append(came_from[path[-1]])
+
+    path.reverse()
     return path
 
 
-def a_star_search(graph, start_node, goal_node):
-    """
-    Assumes the nodes are CartesianNode.
+def breadth_first_search_csr(indptr, indices, start, goal=None):
+    """Parent array of a breadth first search over a CSR adjacency, see Graph.to_csr
+
+    parents[start] is start and unreached vertices have -1. Each level is expanded with whole
+    array operations, so the Python work is per level rather than per edge.
     """
+    import numpy
+
+    indptr = numpy.asarray(indptr)
+    indices = numpy.asarray(indices)
+    parents = numpy.full(len(indptr) - 1, -1, dtype=numpy.int64)
+    parents[start] = start
+    frontier = numpy.array([start], dtype=numpy.int64)
 
-    def find_node_queue_index(node, queue):
-        for i, (v, n) in enumerate(queue):
-            if n == node:
-                return i
-        return -1
+    while len(frontier) > 0 and (goal is None or parents[goal] == -1):
+        # Gather every edge leaving the frontier
+        degrees = indptr[frontier + 1] - indptr[frontier]
+        edge_sources = numpy.repeat(frontier, degrees)
+        offsets = numpy.arange(int(degrees.sum())) - numpy.repeat(numpy.cumsum(degrees) - degrees, degrees)
+        edge_targets = indices[numpy.repeat(indptr[frontier], degrees) + offsets]
 
-    def g(cost_map, node):
-        return cost_map[node]
+        is_new = parents[edge_targets] == -1
+        frontier, first_edge = numpy.unique(edge_targets[is_new], return_index=True)
+        parents[frontier] = edge_sources[is_new][first_edge]
 
-    def h(node_a, node_b):
-        return node_a.distance(node_b)
+    return parents
 
-    def f(cost_map, node_a, node_b):
-        return g(cost_map, node_a) + h(node_a, node_b)
 
-    visited = set()
-    came_from = {node: None for node in graph.nodes.values()}
-    actual_cost = {node: math.inf for node in graph.nodes.values()}
-    actual_cost[start_node] = 0
+def depth_first_search_csr(indptr, indices, start, goal=None):
+    """Parent array of a depth first search over a CSR adjacency, see breadth_first_search_csr"""
+    import numpy
 
-    queue = [(math.inf if node != start_node else start_node.distance(goal_node), node)
-             for node in graph.nodes.values()]
+    parents = numpy.full(len(indptr) - 1, -1, dtype=numpy.int64)
+    indptr = numpy.asarray(indptr).tolist()
+    indices = numpy.asarray(indices).tolist()
+    is_visited = [False] * (len(indptr) - 1)
+    frontier = [(start, start)]
 
-    heapq.heapify(queue)
+    while len(frontier) > 0:
+        current, parent = frontier.pop()
+        if is_visited[current]:
+            continue
+
+        is_visited[current] = True
+        parents[current] = parent
+        if current == goal:
+            break
+
+        for neighbour in indices[indptr[current]:indptr[current + 1]]:
+            if not is_visited[neighbour]:
+                frontier.append((neighbour, current))
+
+    return parents
+
+
+def csr_path(parents, start, goal):
+    """Vertex indices from start to goal in a parent array, or None if goal was not reached"""
+    if parents[goal] == -1:
+        return None
+
+    path = [goal]
+    while path[-1] != start:
+        path.append(int(parents[path[-1]]))
+
+    path.reverse()
+    return path
+
+
+def a_star_search(graph, start_node, goal_node, heuristic=None, return_path=False):
+    """
+    Assumes the nodes are CartesianNode.
+
+    Returns came_from, {node: parent} for the nodes the search reached, or with return_path
+    the same path as reconstruct_path(came_from, start_node, goal_node).
+
+    Edges cost the euclidian distance between their nodes. heuristic is a dim_compare function
+    for CartesianNode.distance, such as CartesianNode.manhattan_distance, used to estimate the
+    remaining distance to goal_node (euclidian by default). It should not overestimate, or the
+    path found may not be the shortest.
+
+    Nodes only enter the queue once they are reached, so the work is proportional to the part of
+    the graph that is explored, and the search stops as soon as goal_node is expanded.
+    """
+
+    def h(node):
+        return node.distance(goal_node, heuristic)
+
+    came_from = {start_node: None}
+    actual_cost = {start_node: 0}
+    closed = set()
+
+    # The counter breaks ties without comparing nodes
+    tie_breaker = itertools.count()
+    queue = [(h(start_node), next(tie_breaker), start_node)]
 
     while len(queue) > 0:
-        current = heapq.heappop(queue)
-        current_node = current[1]
-        heap_modified = False
+        current_node = heapq.heappop(queue)[2]
+
+        # Outdated entry of a node that was since queued with a lower cost
+        if current_node in closed:
+            continue
 
         if current_node == goal_node:
             break
 
-        visited.add(current)
+        closed.add(current_node)
 
         for neighbour_node in current_node.neighbours:
-            if neighbour_node not in visited:
-                inter_node_distance = current_node.distance(neighbour_node)
+            if neighbour_node not in closed:
                 tentative_actual_cost = actual_cost[current_node] + \
-                    inter_node_distance
+                    current_node.distance(neighbour_node)
 
-                # Neighbour was reached an actual distance than before
-                if tentative_actual_cost < actual_cost[neighbour_node]:
+                # Neighbour was reached with a shorter actual distance than before
+                if tentative_actual_cost < actual_cost.get(neighbour_node, math.inf):
                     actual_cost[neighbour_node] = tentative_actual_cost
                     came_from[neighbour_node] = current_node
+                    heapq.heappush(queue, (tentative_actual_cost + h(neighbour_node),
+                                           next(tie_breaker), neighbour_node))
 
-                    neighbour_queue_index = find_node_queue_index(
-                        neighbour_node, queue)
-
-                    if 0 <= neighbour_queue_index < len(queue):
-                        queue[neighbour_queue_index] = (
-                            actual_cost[neighbour_node] + neighbour_node.distance(goal_node), neighbour_node)
-                        heap_modified = True
-
-        if heap_modified:
-            heapq.heapify(queue)
+    if return_path:
+        return reconstruct_path(came_from, start_node, goal_node)
 
     return came_from
 
@@ -130,13 +235,17 @@ if __name__ == "__main__":
     graph = Graph.Graph(nodes=nodes)
 
     dfs = depth_first_search(graph, node_a, node_e)
+    bfs = breadth_first_search(graph, node_a, node_e)
     astar_cf = a_star_search(graph, node_a, node_e)
 
     print(dfs)
+    print(bfs)
     print(astar_cf)
     test_result = {
         c.key: f.key if f is not None else None for c, f in astar_cf.items()}
     print('test result: ', test_result)
 
     print(reconstruct_path(astar_cf, node_a, node_e))
+    print(a_star_search(graph, node_a, node_e,
+                        Node.CartesianNode.manhattan_distance, return_path=True))
     print()
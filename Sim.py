@@ -1,15 +1,22 @@
 import tkinter as tk
 import turtle
 import math
+import queue
+import logging
+import threading
+import traceback
+import collections
+import concurrent.futures
 import Pathfinder
-import time
+import Partition
 
 # CONTROLS
 #
 # - Left click on canvas: Add new item
-# - Left click on item: Start optimized tour from that item
+# - Left click on item: Start optimized tour from that item, exact for small maps
 # - Right click on item: Start prim mst tour from that item
 # - Middle click on item: Move turtle directly to that item
+# - 1 to 9: Number of turtles sharing the optimized tour
 #
 
 
@@ -33,6 +40,15 @@ class Application:
     _ITEM_DRAW_RADIUS = 8
     _DEFAULT_OBSTACLE_RADIUS = 12
 
+    _POLL_INTERVAL_MS = 16  # ~60 fps
+    _HOVER_DEBOUNCE_MS = 50
+
+    # Smaller fleets are solved on the worker thread, starting worker processes costs more than it saves
+    _FLEET_PROCESS_ITEM_COUNT = 1000
+
+    _FLEET_COLOURS = ('blue', 'orange', 'purple', 'brown',
+                      'magenta', 'cyan', 'olive', 'grey')
+
     BTN_CODES = {'L_BTN': '<Button-1>', 'R_BTN': '<Button-3>', 'M_BTN': '<Button-2>',
                  'HOVER': '<Enter>', 'UNHOVER': '<Leave>'}
 
@@ -48,13 +64,19 @@ class Application:
         self._init_canvas()
         self._init_turtle()
         self._init_canvas_buttons()
+        self._init_worker()
 
     def _init_default_states(self):
-        self.lock_hover_lines = False
-        self.hover_render_time = None
-        self.hover_engaged = False
+        self.hover_item = None
+        self.hover_after_id = None
+        self.hover_cache = {}  # (graph version, item ID) -> preview edges
         self.hover_lines = []
 
+        self.fleetSize = 1
+        self.fleetTurtles = []
+        self.fleetPaths = []
+        self.fleetExecutor = None  # process pool kept between fleet tours, created on first use
+
         self.itemID = '0'
         self.obstacleID = '0'
         self.addItemMode = True
@@ -86,58 +108,217 @@ class Application:
         else:
             return None
 
+    def _init_worker(self):
+        # Tours are computed on a background thread against a snapshot of the pathfinder.
+        # Jobs are (job type, request, function), and results are handed back through
+        # result_queue, which the Tk loop polls with root.after
+        self.job_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+        self.tour_request = 0
+        self.worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker.start()
+        self.root.after(self._POLL_INTERVAL_MS, self._poll_results)
+
+    def _worker_loop(self):
+        while True:
+            job_type, request, job = self.job_queue.get()
+            try:
+                job()
+            except Exception as error:
+                self.result_queue.put(('error', request, (job_type, error, traceback.format_exc())))
+
+    def _poll_results(self):
+        try:
+            while True:
+                result_type, request, data = self.result_queue.get_nowait()
+
+                if result_type == 'waypoint':
+                    self._traverse_waypoint(request, data)
+                    break  # One turtle move per tick keeps the event loop responsive
+                elif result_type == 'tour_done':
+                    self._finish_traversal(request)
+                elif result_type == 'hover':
+                    self._receive_hover_preview(request, data)
+                elif result_type == 'fleet':
+                    self._start_fleet(request, data)
+                elif result_type == 'error':
+                    self._report_error(request, *data)
+        except queue.Empty:
+            pass
+
+        if len(self.fleetPaths) > 0:
+            self._advance_fleet()
+
+        self.root.after(self._POLL_INTERVAL_MS, self._poll_results)
+
     def _turtle_traversal(self, item_id='a', traversal_type='optimized'):
-        if not self.isTurtleMoving:
+        if traversal_type == 'optimized' and self.fleetSize > 1:
+            self._fleet_traversal(item_id)
+        elif not self.isTurtleMoving and traversal_type in ('optimized', 'tour'):
             item_position = self.pathfinder.item_position(item_id)
             self.isTurtleMoving = True
+            self._clear_fleet()
             self.turtleBot.clear()
             self.canvas.delete(*self.visit_order_text)
             self.visit_order_text = []
 
             outline_radial_factor = 1.75
-            outline = self.canvas.create_oval(item_position[0] - outline_radial_factor * self._ITEM_DRAW_RADIUS, item_position[1] - outline_radial_factor * self._ITEM_DRAW_RADIUS,
-                                              item_position[0] + outline_radial_factor * self._ITEM_DRAW_RADIUS, item_position[1] + outline_radial_factor * self._ITEM_DRAW_RADIUS)
+            self.traversal_outline = self.canvas.create_oval(item_position[0] - outline_radial_factor * self._ITEM_DRAW_RADIUS, item_position[1] - outline_radial_factor * self._ITEM_DRAW_RADIUS,
+                                                             item_position[0] + outline_radial_factor * self._ITEM_DRAW_RADIUS, item_position[1] + outline_radial_factor * self._ITEM_DRAW_RADIUS)
+            self.root.title(self._APPLICATION_NAME)
+            self.traversal_visit_order = 0
+            self.traversal_original_size = self.turtleBot.turtlesize()
+            self.traversal_size = list(self.traversal_original_size)
+
+            self.tour_request += 1
+            request = self.tour_request
+            pathfinder = self.pathfinder.snapshot()
+
+            def compute_tour():
+                if traversal_type == 'optimized' and len(pathfinder.item_keys()) <= Pathfinder.EXACT_TOUR_LIMIT:
+                    path = pathfinder.auto_tour(item_id)
+                elif traversal_type == 'optimized':
+                    # Stream waypoints so the turtle starts moving before the whole tour is known
+                    path = pathfinder.mst_optimized_tour_generator(item_id)
+                else:
+                    path = pathfinder.mst_euler_tour(item_id)[item_id]
+
+                for key in path:
+                    if request != self.tour_request:
+                        return
+                    self.result_queue.put(
+                        ('waypoint', request, pathfinder.item_position(key)))
+
+                self.result_queue.put(('tour_done', request, None))
+
+            self.job_queue.put(('tour', request, compute_tour))
+
+    def _report_error(self, request, job_type, error, details):
+        # Show the failure in the title bar, with the traceback in the log
+        logging.error('Background %s computation failed\n%s', job_type, details)
+        self.root.title(f'{self._APPLICATION_NAME} - {job_type} failed: {error}')
+
+        if job_type == 'tour':
+            self._finish_traversal(request)
+        elif job_type == 'fleet':
+            self._abandon_fleet(request)
+
+    def _traverse_waypoint(self, request, key_position):
+        if request != self.tour_request or not self.isTurtleMoving:
+            return
 
-            vertical_text_offset = 20
+        vertical_text_offset = 20
+        self.traversal_visit_order += 1
 
-            path = []
+        if self.traversal_visit_order > 1:
+            self._move_turtle(key_position)
+        else:
+            # Move the turtle to the start without drawing a line
+            self.turtleBot.penup()
+            self._move_turtle(key_position)
+            self.turtleBot.pendown()
+
+        self.visit_order_text.append(self.canvas.create_text(
+            key_position[0], key_position[1] + vertical_text_offset, text=str(self.traversal_visit_order)))
+
+        size = self.traversal_size
+        if size[0] < 2.5:
+            size[0] *= 1.025
+            size[1] *= 1.025
+        self.turtleBot.turtlesize(*size)
+
+    def _finish_traversal(self, request):
+        if request != self.tour_request or not self.isTurtleMoving:
+            return
 
-            if traversal_type == 'optimized':
-                path = self.pathfinder.mst_optimized_tour(item_id)
-            elif traversal_type == 'tour':
-                path = self.pathfinder.mst_euler_tour(item_id)[item_id]
+        size = self.traversal_size
+        while size[0] > self.traversal_original_size[0]:
+            size[0] *= 0.95
+            size[1] *= 0.95
+            self.turtleBot.turtlesize(*size)
+
+        self.turtleBot.turtlesize(*self.traversal_original_size)
+        self.canvas.delete(self.traversal_outline)
+        self.isTurtleMoving = False
+
+    def _fleet_traversal(self, item_id='a'):
+        if self.isTurtleMoving:
+            return
+
+        self.isTurtleMoving = True
+        self._clear_fleet()
+        self.turtleBot.clear()
+        self.canvas.delete(*self.visit_order_text)
+        self.visit_order_text = []
+        self.root.title(self._APPLICATION_NAME)
+
+        self.tour_request += 1
+        request = self.tour_request
+        pathfinder = self.pathfinder.snapshot()
+        fleet_size = self.fleetSize
+
+        def compute_fleet():
+            keys = pathfinder.item_keys()
+            positions = [pathfinder.item_position(key) for key in keys]
+            # The clicked item is the first depot, the others are spread out as far as possible
+            depot_indices = Partition.farthest_point_indices(
+                positions, fleet_size, keys.index(item_id))
+            depot_keys = [keys[i] for i in depot_indices]
+            if len(keys) < self._FLEET_PROCESS_ITEM_COUNT:
+                routes = pathfinder.multi_vehicle_tours(depot_keys, max_workers=1)
             else:
-                return
+                if self.fleetExecutor is None:
+                    self.fleetExecutor = concurrent.futures.ProcessPoolExecutor()
+                routes = pathfinder.multi_vehicle_tours(depot_keys, executor=self.fleetExecutor)
+            self.result_queue.put(('fleet', request, [[pathfinder.item_position(key) for key in path]
+                                                      for path, cost in routes.values()]))
 
-            original_turtle_size = self.turtleBot.turtlesize()
-            size = list(original_turtle_size)
+        self.job_queue.put(('fleet', request, compute_fleet))
 
-            for visit_order, key in enumerate(path, 1):
-                key_position = self.pathfinder.item_position(key)
-                if visit_order > 1:
-                    self._move_turtle(key_position)
-                else:
-                    # Move the turtle to the start without drawing a line
-                    self.turtleBot.penup()
-                    self._move_turtle(item_position)
-                    self.turtleBot.pendown()
-
-                self.visit_order_text.append(self.canvas.create_text(
-                    key_position[0], key_position[1] + vertical_text_offset, text=str(visit_order)))
-                if size[0] < 2.5:
-                    size[0] *= 1.025
-                    size[1] *= 1.025
-                self.turtleBot.turtlesize(*size)
-
-            while size[0] > original_turtle_size[0]:
-                size[0] *= 0.95
-                size[1] *= 0.95
-                self.turtleBot.turtlesize(*size)
-
-            self.turtleBot.turtlesize(*original_turtle_size)
-            self.canvas.delete(outline)
+    def _start_fleet(self, request, routes):
+        if request != self.tour_request or not self.isTurtleMoving:
+            return
+
+        while len(self.fleetTurtles) < len(routes):
+            fleet_turtle = turtle.RawTurtle(self.turtleWindow)
+            fleet_turtle.shape('turtle')
+            fleet_turtle.color(
+                self._FLEET_COLOURS[len(self.fleetTurtles) % len(self._FLEET_COLOURS)])
+            self.fleetTurtles.append(fleet_turtle)
+
+        turtles = [self.turtleBot] + self.fleetTurtles
+        self.fleetPaths = []
+
+        for fleet_turtle, route in zip(turtles, routes):
+            fleet_turtle.showturtle()
+            fleet_turtle.penup()
+            self._move_turtle(route[0], fleet_turtle)
+            fleet_turtle.pendown()
+            self.fleetPaths.append((fleet_turtle, collections.deque(route[1:])))
+
+    def _advance_fleet(self):
+        # Every turtle takes one step per tick so the whole fleet moves together
+        for fleet_turtle, route in self.fleetPaths:
+            if len(route) > 0:
+                self._move_turtle(route.popleft(), fleet_turtle)
+
+        if all(len(route) == 0 for fleet_turtle, route in self.fleetPaths):
+            self.fleetPaths = []
             self.isTurtleMoving = False
 
+    def _abandon_fleet(self, request):
+        if request != self.tour_request or not self.isTurtleMoving:
+            return
+
+        self._clear_fleet()
+        self.fleetPaths = []
+        self.isTurtleMoving = False
+
+    def _clear_fleet(self):
+        for fleet_turtle in self.fleetTurtles:
+            fleet_turtle.clear()
+            fleet_turtle.hideturtle()
+
     def _item_id_at_canvas_coordinate(self, event):
         new_coordinate = self._convert_canvas_coordinate_to_draw_coordinate(
             event.x, event.y)
@@ -149,78 +330,88 @@ class Application:
             return item_id
 
     def _item_entered(self, event):
-        if len(self.hover_lines) > 0 or len(self.pathfinder.itemGraph.vertexDict) <= 1:
+        item_id = self._item_id_at_canvas_coordinate(event)
+        if item_id is None or len(self.pathfinder.itemGraph.vertexDict) <= 1:
             return
 
-        if not self.hover_engaged and not self.lock_hover_lines:
+        self._clear_hover_lines()
+        self.hover_item = item_id
 
-            render_refresh_time = (1/30) * 1000
+        # Debounce so sweeping the cursor across many items only previews the last one
+        if self.hover_after_id is not None:
+            self.root.after_cancel(self.hover_after_id)
+        self.hover_after_id = self.root.after(
+            self._HOVER_DEBOUNCE_MS, self._request_hover_preview, item_id)
 
-            current_time = time.time() * 1000
+    def _request_hover_preview(self, item_id):
+        self.hover_after_id = None
+        if item_id != self.hover_item or not self.pathfinder.has_item(item_id):
+            return
 
-            if self.hover_render_time is None:
-                self.hover_render_time = current_time
-            elif current_time - self.hover_render_time < render_refresh_time:
-                return
+        cache_key = (self.pathfinder.graph_version(), item_id)
+        if cache_key in self.hover_cache:
+            self._draw_hover_lines(self.hover_cache[cache_key])
+            return
 
-            self.hover_render_time = current_time
+        pathfinder = self.pathfinder.snapshot()
 
-            self.hover_engaged = True
-            self.lock_hover_lines = True
-            item_id = self._item_id_at_canvas_coordinate(event)
-            if self.pathfinder.has_item(item_id):
+        def compute_preview():
+            path_endpoints = pathfinder.mst_euler_tour(item_id)[item_id]
+            endpoint_coordinates = [pathfinder.item_position(c)
+                                    for c in path_endpoints]
 
-                path_endpoints = self.pathfinder.mst_euler_tour(item_id)[item_id]
+            edge_set = set()
 
-                endpoint_coordinates = [(
-                    self.pathfinder.item_position(c)[0], self.pathfinder.item_position(c)[1]) for c in path_endpoints]
+            for i in range(len(endpoint_coordinates) - 1):
+                curr_ = endpoint_coordinates[i]
+                next_ = endpoint_coordinates[i + 1]
 
-                edge_set = set()
+                if (curr_, next_) not in edge_set and (next_, curr_) not in edge_set:
+                    edge_set.add((curr_, next_))
 
-                for i in range(len(endpoint_coordinates) - 1):
-                    curr_ = endpoint_coordinates[i]
-                    next_ = endpoint_coordinates[i + 1]
+            self.result_queue.put(('hover', cache_key, edge_set))
 
-                    if (curr_, next_) not in edge_set and (next_, curr_) not in edge_set:
-                        edge_set.add((curr_, next_))
+        self.job_queue.put(('hover preview', cache_key, compute_preview))
 
-                tag = 'HOVERLINE'
+    def _receive_hover_preview(self, cache_key, edge_set):
+        version, item_id = cache_key
 
-                for edge in edge_set:
-                    x1 = edge[0][0]
-                    y1 = edge[0][1]
-                    x2 = edge[1][0]
-                    y2 = edge[1][1]
-                    line = self.canvas.create_line(x1, y1, x2, y2, fill = 'grey', tags = (tag, ))
-                    self.hover_lines.append(line)
+        # Previews of older graph versions can never be hit again
+        if version != self.pathfinder.graph_version():
+            return
 
-            self.lock_hover_lines = False
-          
+        self.hover_cache = dict(
+            (key, edges) for key, edges in self.hover_cache.items() if key[0] == version)
+        self.hover_cache[cache_key] = edge_set
 
-    def _item_left(self, event):
+        if item_id == self.hover_item and len(self.hover_lines) == 0:
+            self._draw_hover_lines(edge_set)
 
-        if len(self.hover_lines) == 0:
-            return
-
-        current_time = time.time() * 1000
-        at_least_time = (1/15) * 1000
+    def _draw_hover_lines(self, edge_set):
+        tag = 'HOVERLINE'
 
-        if self.hover_render_time is None:
-            return
-        elif current_time - self.hover_render_time < at_least_time:
-            return
+        for edge in edge_set:
+            x1 = edge[0][0]
+            y1 = edge[0][1]
+            x2 = edge[1][0]
+            y2 = edge[1][1]
+            line = self.canvas.create_line(x1, y1, x2, y2, fill = 'grey', tags = (tag, ))
+            self.hover_lines.append(line)
 
-        if self.hover_engaged and not self.lock_hover_lines:
+    def _clear_hover_lines(self):
+        for line in self.hover_lines:
+            self.canvas.delete(line)
 
-            self.lock_hover_lines = True
+        self.hover_lines = []
 
-            for line in self.hover_lines:
-                self.canvas.delete(line)
+    def _item_left(self, event):
+        self.hover_item = None
 
-            self.hover_lines = []
+        if self.hover_after_id is not None:
+            self.root.after_cancel(self.hover_after_id)
+            self.hover_after_id = None
 
-            self.lock_hover_lines = False
-            self.hover_engaged = False
+        self._clear_hover_lines()
 
 
     def _item_left_clicked(self, event):
@@ -306,6 +497,9 @@ class Application:
                 if event.char == 't':
                     self.addItemMode = not self.addItemMode
 
+                if event.char.isdigit() and event.char != '0':
+                    self.fleetSize = int(event.char)
+
                 if event.char == 'c':
                     if not self.isTurtleMoving:
                         self.canvas.delete('all')
@@ -324,10 +518,12 @@ class Application:
         self.addItem = CanvasInput(
             c=self.root, input_code='<KeyRelease>', action_func=key_release)
 
-    def _move_turtle(self, raw_coordinate=(0, 0)):
+    def _move_turtle(self, raw_coordinate=(0, 0), turtle_bot=None):
+        if turtle_bot is None:
+            turtle_bot = self.turtleBot
         converted_pos = (raw_coordinate[0], -raw_coordinate[1])
-        self.turtleBot.setheading(self.turtleBot.towards(converted_pos))
-        self.turtleBot.goto(converted_pos)
+        turtle_bot.setheading(turtle_bot.towards(converted_pos))
+        turtle_bot.goto(converted_pos)
 
     def _convert_canvas_coordinate_to_draw_coordinate(self, x=0, y=0):
         # (0, 0) for turtle is the centre
@@ -338,45 +534,38 @@ class Application:
         return math.sqrt(pow(pos2[0] - pos1[0], 2) + pow(pos2[1] - pos1[1], 2))
 
     def _get_closest_key_to_coord(self, pos=(0, 0)):
-        items = [(key, self.pathfinder.item_position(key))
-                 for key in self.pathfinder.item_keys()]
-
-        if len(items) == 0:
-            return None
-        else:
-            return min(items, key=lambda x: self._pythag_dist(pos, x[1]))[0]
+        return self.pathfinder.nearest_item(pos[0], pos[1])
 
     def _get_clicked_item_key(self, click_pos=(0, 0)):
         pos_converted = self._convert_canvas_coordinate_to_draw_coordinate(
             click_pos[0], click_pos[1])
-        closest_key = self._get_closest_key_to_coord(pos_converted)
-        if closest_key is not None and self._pythag_dist(pos_converted, self.pathfinder.item_position(closest_key)) <= 3 * self._ITEM_DRAW_RADIUS:
-            return closest_key
-        else:
-            return None
+        return self.pathfinder.nearest_item(pos_converted[0], pos_converted[1], 3 * self._ITEM_DRAW_RADIUS)
 
     def _get_clicked_obstacle_key(self, click_pos=(0, 0)):
         pos_converted = self._convert_canvas_coordinate_to_draw_coordinate(
             click_pos[0], click_pos[1])
-        obstacles = [(key, self.pathfinder.obstacle_position_radius(key))
-                     for key in self.pathfinder.obstacle_keys()]
+        closest_obstacle_key = self.pathfinder.nearest_obstacle(
+            pos_converted[0], pos_converted[1])
 
-        if len(obstacles) == 0:
+        if closest_obstacle_key is None:
             return None
 
-        closest_obstacle = min(obstacles, key=lambda x: self._pythag_dist(
-            pos_converted, (x[1][0], x[1][1])))
-
-        radius = closest_obstacle[1][2]
-        closest_obstacle_pos = (closest_obstacle[1][0], closest_obstacle[1][1])
+        closest_obstacle = self.pathfinder.obstacle_position_radius(
+            closest_obstacle_key)
+        radius = closest_obstacle[2]
+        closest_obstacle_pos = (closest_obstacle[0], closest_obstacle[1])
 
         if self._pythag_dist(pos_converted, closest_obstacle_pos) <= 1.5 * radius:
-            return closest_obstacle[0]
+            return closest_obstacle_key
         else:
             return None
 
     def start(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self.fleetExecutor is not None:
+                self.fleetExecutor.shutdown(wait=False)
 
 
 if __name__ == '__main__':
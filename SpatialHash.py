@@ -0,0 +1,111 @@
+import math
+
+
+class SpatialHash:
+    """Uniform grid of buckets for nearest point queries on points that are added, moved and removed
+
+    Queries search rings of cells outwards from the query point, so their cost depends on the local
+    density rather than on the number of points.
+    """
+
+    def __init__(self, cell_size: float = 32.0):
+        if cell_size <= 0:
+            raise ValueError('Cell size must be positive')
+        self.cellSize = float(cell_size)
+        self.cells = {}  # (cell x, cell y) -> set of keys
+        self.positions = {}  # key -> (x, y)
+
+        # Bounds of every cell ever occupied, an upper bound on how far a ring search must go
+        self._cellBounds = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def insert(self, key, x: float = 0, y: float = 0):
+        if key in self.positions:
+            raise ValueError(f'Key {key} already in spatial hash')
+
+        position = (float(x), float(y))
+        cell = self._cell_of(position)
+        self.positions[key] = position
+        self.cells.setdefault(cell, set()).add(key)
+
+        if self._cellBounds is None:
+            self._cellBounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            bounds = self._cellBounds
+            bounds[0] = min(bounds[0], cell[0])
+            bounds[1] = min(bounds[1], cell[1])
+            bounds[2] = max(bounds[2], cell[0])
+            bounds[3] = max(bounds[3], cell[1])
+
+    def remove(self, key):
+        position = self.positions.pop(key)
+        cell = self._cell_of(position)
+        self.cells[cell].discard(key)
+        if len(self.cells[cell]) == 0:
+            del self.cells[cell]
+
+    def move(self, key, x: float = 0, y: float = 0):
+        self.remove(key)
+        self.insert(key, x, y)
+
+    def nearest(self, x: float = 0, y: float = 0, max_distance: float = math.inf):
+        """Key of the closest point within max_distance of (x, y), or None"""
+        if len(self.positions) == 0:
+            return None
+
+        centre_x, centre_y = self._cell_of((x, y))
+        bounds = self._cellBounds
+        last_ring = max(centre_x - bounds[0], bounds[2] - centre_x,
+                        centre_y - bounds[1], bounds[3] - centre_y, 0)
+        if max_distance != math.inf:
+            last_ring = min(last_ring, int(max_distance // self.cellSize) + 1)
+
+        best_key = None
+        best_distance = max_distance
+
+        for ring in range(last_ring + 1):
+            # The query may sit anywhere in its own cell, so points in this ring are
+            # at least (ring - 1) * cellSize away
+            if best_key is not None and best_distance <= (ring - 1) * self.cellSize:
+                break
+
+            for cell in self._ring_cells(centre_x, centre_y, ring):
+                for key in self.cells.get(cell, ()):
+                    position = self.positions[key]
+                    distance = math.hypot(position[0] - x, position[1] - y)
+                    if distance <= best_distance and (best_key is None or distance < best_distance or key < best_key):
+                        best_key = key
+                        best_distance = distance
+
+        return best_key
+
+    def _cell_of(self, position):
+        return (math.floor(position[0] / self.cellSize), math.floor(position[1] / self.cellSize))
+
+    def _ring_cells(self, centre_x: int, centre_y: int, ring: int):
+        if ring == 0:
+            yield (centre_x, centre_y)
+            return
+
+        for cell_x in range(centre_x - ring, centre_x + ring + 1):
+            yield (cell_x, centre_y - ring)
+            yield (cell_x, centre_y + ring)
+        for cell_y in range(centre_y - ring + 1, centre_y + ring):
+            yield (centre_x - ring, cell_y)
+            yield (centre_x + ring, cell_y)
+
+
+if __name__ == '__main__':
+    spatial_hash = SpatialHash(10)
+    spatial_hash.insert('A', 0, 0)
+    spatial_hash.insert('B', 25, 5)
+    spatial_hash.insert('C', -40, 12)
+    print(spatial_hash.nearest(20, 0))
+    spatial_hash.move('C', 21, 1)
+    print(spatial_hash.nearest(20, 0))
+    print(spatial_hash.nearest(100, 100, max_distance=10))
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+
+
+class TourCache:
+    """Least recently used cache of computed tours, safe to share between threads
+
+    Entries are keyed by (algorithm, start key, metric, graph fingerprint), so an unchanged map,
+    or one rebuilt to the same items and blocked edges, reuses earlier tours.
+    A closed tour visits the same items whichever item it starts at, so when allow_rotation is
+    set a request for a new start is answered by rotating a cached closed tour of the same map.
+
+    max_entries bounds the number of tours and max_waypoints their total length, the least
+    recently used tours are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 128, max_waypoints: int = 1000000, allow_rotation: bool = True):
+        if max_entries < 0 or max_waypoints < 0:
+            raise ValueError('Cache limits cannot be negative')
+
+        self.maxEntries = max_entries
+        self.maxWaypoints = max_waypoints
+        self.allowRotation = allow_rotation
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (algorithm, start key, metric, fingerprint) -> (tour tuple, is closed)
+        self._closedStarts = {}  # (algorithm, metric, fingerprint) -> {start key of a cached closed tour}
+        self._waypointCount = 0
+
+        self.hits = 0
+        self.rotations = 0  # Hits answered by rotating another start's tour
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, algorithm: str = '', start_key: str = '', metric=None, fingerprint: str = ''):
+        """The cached tour as a new list, or None"""
+        key = (algorithm, start_key, metric, fingerprint)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[0])
+
+            if self.allowRotation:
+                for other_start in self._closedStarts.get((algorithm, metric, fingerprint), ()):
+                    other_key = (algorithm, other_start, metric, fingerprint)
+                    rotated = _rotate(self._entries[other_key][0], start_key)
+                    if rotated is not None:
+                        self._entries.move_to_end(other_key)
+                        self.rotations += 1
+                        return rotated
+
+            self.misses += 1
+            return None
+
+    def put(self, algorithm: str = '', start_key: str = '', metric=None, fingerprint: str = '', tour=(), closed: bool = True):
+        """Store a tour, closed tours can later be rotated to other starts"""
+        key = (algorithm, start_key, metric, fingerprint)
+        tour = tuple(tour)
+        if len(tour) > self.maxWaypoints or self.maxEntries == 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (tour, closed)
+            self._waypointCount += len(tour)
+            if closed:
+                self._closedStarts.setdefault((algorithm, metric, fingerprint), set()).add(start_key)
+
+            while len(self._entries) > self.maxEntries or self._waypointCount > self.maxWaypoints:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._closedStarts.clear()
+            self._waypointCount = 0
+
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache, rotations included"""
+        lookups = self.hits + self.rotations + self.misses
+        return (self.hits + self.rotations) / lookups if lookups > 0 else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'waypoints': self._waypointCount,
+                    'hits': self.hits, 'rotations': self.rotations, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': self.hit_rate()}
+
+    def _remove(self, key):
+        tour, closed = self._entries.pop(key)
+        self._waypointCount -= len(tour)
+        if closed:
+            algorithm, start_key, metric, fingerprint = key
+            starts = self._closedStarts[(algorithm, metric, fingerprint)]
+            starts.discard(start_key)
+            if len(starts) == 0:
+                del self._closedStarts[(algorithm, metric, fingerprint)]
+
+
+def _rotate(tour=(), start_key: str = ''):
+    """Closed tour started and ended at start_key, None if it does not visit start_key"""
+    if len(tour) < 2 or tour[0] != tour[-1]:
+        return None
+    try:
+        index = tour.index(start_key, 0, len(tour) - 1)
+    except ValueError:
+        return None
+    return list(tour[index:-1]) + list(tour[:index]) + [start_key]
+
+
+if __name__ == '__main__':
+    cache = TourCache(max_entries=2)
+    cache.put('mst_optimized_tour', 'A', None, 'map', ['A', 'B', 'C', 'A'])
+    print(cache.get('mst_optimized_tour', 'A', None, 'map'))
+    print(cache.get('mst_optimized_tour', 'C', None, 'map'))
+    print(cache.get('mst_optimized_tour', 'D', None, 'map'))
+    print(cache.stats())
@@ -0,0 +1,57 @@
+import math
+import random
+
+import CompleteGraph
+import Metric
+import Pathfinder
+
+
+def uphill(position_a, position_b):
+    """Euclidean distance with climbs costing four times as much as descents"""
+    climb = position_b[1] - position_a[1]
+    return math.hypot(position_b[0] - position_a[0], climb) + (3 * climb if climb > 0 else 0)
+
+
+def random_pathfinder(count, metric=None, seed=0):
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder(metric=metric)
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(count)])
+    return pathfinder
+
+
+def run_planner(pathfinder):
+    costs = []
+    planner = pathfinder.anytime_tour('0', time_budget=0.3, callback=lambda tour, cost: costs.append(cost))
+    initial_cost = planner.best()[1]
+    tour, cost = planner.wait()
+    return (initial_cost, costs, tour, cost)
+
+
+def test_improvements_only_lower_the_cost():
+    pathfinder = random_pathfinder(60)
+    initial_cost, costs, tour, cost = run_planner(pathfinder)
+
+    assert len(costs) > 0
+    assert all(later < earlier for earlier, later in zip([initial_cost] + costs, costs))
+    assert cost == costs[-1] == pathfinder.tour_cost(tour)
+    assert set(tour) == set(pathfinder.item_keys())
+
+
+def test_asymmetric_metrics_skip_two_opt(monkeypatch):
+    calls = []
+    two_opt_order = CompleteGraph.CompleteGraph.two_opt_order
+
+    def counted_two_opt_order(*arguments, **keywords):
+        calls.append(arguments)
+        return two_opt_order(*arguments, **keywords)
+
+    monkeypatch.setattr(CompleteGraph.CompleteGraph, 'two_opt_order', counted_two_opt_order)
+    pathfinder = random_pathfinder(30, Metric.CallableMetric(uphill))
+    initial_cost, costs, tour, cost = run_planner(pathfinder)
+
+    assert len(calls) == 0
+    assert all(later < earlier for earlier, later in zip([initial_cost] + costs, costs))
+    assert cost <= initial_cost
+    assert cost == pathfinder.tour_cost(tour)
+    assert tour[0] == tour[-1] == '0'
+    assert set(tour) == set(pathfinder.item_keys())
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import AsyncPathfinder
+
+ITEMS = [('A', 0, 0), ('B', 10, 10), ('C', 10, 20), ('D', 20, 10)]
+
+
+def test_facade_created_before_the_loop():
+    service = AsyncPathfinder.AsyncPathfinder()
+
+    async def main():
+        await asyncio.gather(service.add_items(ITEMS), service.add_obstacle('OBS', 5, 5, 1))
+        return await service.mst_optimized_tour('A')
+
+    tour = asyncio.run(main())
+    assert tour[0] == tour[-1] == 'A'
+    assert set(tour) == set('ABCD')
+
+
+def test_concurrent_queries_share_a_computation():
+    service = AsyncPathfinder.AsyncPathfinder()
+
+    async def main():
+        await service.add_items(ITEMS)
+        return await asyncio.gather(*(service.mst_optimized_tour('A') for _ in range(4)))
+
+    tours = asyncio.run(main())
+    assert all(tour is tours[0] for tour in tours)
+
+
+def test_unhashable_arguments_run_uncoalesced():
+    service = AsyncPathfinder.AsyncPathfinder()
+
+    async def main():
+        await service.add_items(ITEMS)
+        return await asyncio.gather(service.tour_cost(['A', 'B']), service.tour_cost(['A', 'B', 'C']))
+
+    costs = asyncio.run(main())
+    assert costs[0] == pytest.approx(200 ** 0.5)
+    assert costs[1] == pytest.approx(200 ** 0.5 + 10)
+
+
+def test_moves_go_through_the_write_queue():
+    service = AsyncPathfinder.AsyncPathfinder()
+
+    async def main():
+        await service.add_items(ITEMS)
+        await service.add_obstacle('OBS', 100, 100, 1)
+        read_view = service.read_view()
+
+        changed = await service.move_obstacle('OBS', 5, 5)
+        assert service.read_view() is not read_view
+        assert changed == {('A', 'B')} or changed == {('B', 'A')}
+
+        changed = await service.move_item('B', 10, 0)
+        assert changed == {('A', 'B')} or changed == {('B', 'A')}
+        return await service.available_path('A', 'B')
+
+    path, cost = asyncio.run(main())
+    assert path == ['A', 'B']
+    assert cost == pytest.approx(10)
@@ -0,0 +1,35 @@
+import io
+import json
+import math
+
+import Batch
+
+
+def reject_constant(name):
+    raise ValueError(f'{name} is not valid JSON')
+
+
+def test_non_finite_values_are_written_as_null(monkeypatch):
+    def solve_instance(path, algorithm, start, bounds):
+        return {'instance': path, 'tour': ['a'], 'cost': math.inf, 'bounds': (0.0, math.nan), 'gap': -math.inf}
+
+    monkeypatch.setattr(Batch, 'solve_instance', solve_instance)
+    output = io.StringIO()
+    Batch.run(['unreachable.json'], workers=1, output=output)
+
+    result = json.loads(output.getvalue(), parse_constant=reject_constant)
+    assert result == {'instance': 'unreachable.json', 'tour': ['a'], 'cost': None,
+                      'bounds': [0.0, None], 'gap': None}
+
+
+def test_solved_instances_are_strict_json(tmp_path):
+    instance = tmp_path / 'instance.json'
+    instance.write_text(json.dumps({'items': [['a', 0, 0], ['b', 100, 0], ['c', 50, 80]],
+                                    'obstacles': [['o', 100, 0, 5]], 'start': 'a'}))
+    output = io.StringIO()
+
+    assert Batch.run([str(instance)], 'mst_optimized_tour', workers=1, output=output, bounds=True) == 0
+
+    result = json.loads(output.getvalue(), parse_constant=reject_constant)
+    assert result['tour'] == ['a', 'c', 'a']
+    assert math.isfinite(result['cost']) and math.isfinite(result['gap'])
@@ -0,0 +1,57 @@
+import itertools
+import math
+
+import numpy
+import pytest
+
+import CostMatrixGraph
+
+
+def sparse_graph(arcs, keys):
+    """Graph over a CSR matrix holding only the given (from, to, cost) arcs"""
+    index = dict((key, i) for i, key in enumerate(keys))
+    rows = [sorted((index[b], cost) for a, b, cost in arcs if a == key) for key in keys]
+    indptr = numpy.cumsum([0] + [len(row) for row in rows])
+    indices = numpy.array([column for row in rows for column, cost in row], dtype=int)
+    data = numpy.array([cost for row in rows for column, cost in row], dtype=float)
+    matrix = CostMatrixGraph._SparseMatrix(indptr, indices, data, (len(keys), len(keys)))
+    return CostMatrixGraph.CostMatrixGraph(matrix, keys)
+
+
+def test_tour_returns_along_one_way_arcs():
+    # No arc from C back to A, the way home is through B
+    graph = sparse_graph([('A', 'B', 1), ('B', 'C', 1), ('C', 'B', 1), ('B', 'A', 1)], 'ABC')
+
+    tour = graph.atsp_tour('A')
+
+    assert tour == ['A', 'B', 'C', 'B', 'A']
+    assert graph.tour_cost(tour) == 4
+
+
+def test_tour_drops_vertices_with_no_way_back():
+    # C is a dead end, and D is only reachable through it
+    graph = sparse_graph([('A', 'B', 1), ('B', 'A', 1), ('B', 'C', 1), ('C', 'D', 1)], 'ABCD')
+
+    tour = graph.atsp_tour('A')
+
+    assert tour == ['A', 'B', 'A']
+    assert graph.tour_cost(tour) < math.inf
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_or_opt_leaves_no_improving_segment_move(seed):
+    # With every vertex a neighbour, Or-opt stops only when no segment move helps, the closing leg included.
+    # Shortest path costs obey the triangle inequality, so no insertion has a negative cost
+    costs = numpy.random.default_rng(seed).uniform(1, 100, (8, 8))
+    for k in range(8):
+        costs = numpy.minimum(costs, costs[:, k, None] + costs[None, k, :])
+    graph = CostMatrixGraph.CostMatrixGraph(costs)
+    order = graph.or_opt(graph.nearest_neighbour('0'), closed=True)
+    cost = graph.tour_cost(order + ['0'])
+
+    for i, length in itertools.product(range(1, 8), (1, 2, 3)):
+        segment = order[i:i + length]
+        rest = order[:i] + order[i + length:]
+        for position in range(1, len(rest) + 1):
+            moved = rest[:position] + segment + rest[position:]
+            assert graph.tour_cost(moved + ['0']) >= cost - 1e-9
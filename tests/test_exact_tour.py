@@ -0,0 +1,77 @@
+import itertools
+import math
+
+import numpy
+import pytest
+
+import ExactTour
+
+
+def brute_force(distances):
+    """Cheapest closed tour cost from vertex 0 over every visiting order"""
+    n = len(distances)
+    return min((sum(distances[a][b] for a, b in zip((0, *order), (*order, 0)))
+                for order in itertools.permutations(range(1, n))), default=0.0)
+
+
+def order_cost(distances, order):
+    return sum(distances[a][b] for a, b in zip(order, order[1:] + order[:1]))
+
+
+@pytest.mark.parametrize('n', range(1, 9))
+def test_matches_brute_force_on_symmetric_distances(n):
+    points = numpy.random.default_rng(n).uniform(0, 100, (n, 2))
+    distances = numpy.linalg.norm(points[:, None] - points[None], axis=2)
+
+    order, cost = ExactTour.held_karp(distances)
+
+    assert sorted(order) == list(range(n))
+    assert order[0] == 0
+    assert cost == pytest.approx(brute_force(distances))
+    assert order_cost(distances, order) == pytest.approx(cost)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_brute_force_on_asymmetric_distances(seed):
+    distances = numpy.random.default_rng(seed).uniform(1, 100, (8, 8))
+    numpy.fill_diagonal(distances, 0)
+
+    order, cost = ExactTour.held_karp(distances)
+
+    assert cost == pytest.approx(brute_force(distances))
+    assert order_cost(distances, order) == pytest.approx(cost)
+
+
+def test_avoids_missing_edges():
+    distances = numpy.random.default_rng(0).uniform(1, 100, (7, 7))
+    distances[0, 1] = distances[1, 0] = distances[2, 5] = math.inf
+
+    order, cost = ExactTour.held_karp(distances)
+
+    assert cost == pytest.approx(brute_force(distances))
+    assert cost < math.inf
+
+
+def test_no_tour_without_edges_into_a_vertex():
+    distances = numpy.ones((5, 5))
+    distances[:, 3] = math.inf
+
+    assert ExactTour.held_karp(distances) == ([0], math.inf)
+
+
+def test_pathfinder_exact_tour_beats_every_order():
+    import random
+    import Pathfinder
+
+    rng = random.Random(0)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(7)])
+    pathfinder.add_obstacles([('OBS', 65, 50, 8)])
+
+    tour = pathfinder.exact_tour('0')
+    best = min(pathfinder.tour_cost(pathfinder.expand_order(['0', *order], closed=True))
+               for order in itertools.permutations([str(i) for i in range(1, 7)]))
+
+    assert tour[0] == tour[-1] == '0'
+    assert set(tour) == set(pathfinder.item_keys())
+    assert pathfinder.tour_cost(tour) == pytest.approx(best)
@@ -0,0 +1,65 @@
+import logging
+import random
+
+import numpy
+
+import HierarchicalTour
+import Partition
+import Pathfinder
+
+
+def random_items(count, seed=0):
+    rng = random.Random(seed)
+    return [(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(count)]
+
+
+def test_visits_every_item():
+    items = random_items(600)
+    tour = HierarchicalTour.hierarchical_tour(items, (), '0', cell_capacity=64, max_workers=1)
+
+    assert tour[0] == tour[-1] == '0'
+    assert set(tour) == set(item[0] for item in items)
+
+
+def test_enclosed_first_members_do_not_drop_their_cells():
+    items = random_items(1200)
+    labels = Partition.quadtree_partition(numpy.array([item[1:] for item in items]), 64)
+    first_members = {}
+    for i, label in enumerate(labels):
+        first_members.setdefault(int(label), i)
+
+    # Tiny obstacles over the first member of every cell but the start's
+    start_cell = int(labels[0])
+    enclosed = [items[i] for cell, i in first_members.items() if cell != start_cell][:15]
+    obstacles = [(f'OBS{i}', item[1], item[2], 0.5) for i, item in enumerate(enclosed)]
+
+    tour = HierarchicalTour.hierarchical_tour(items, obstacles, '0', cell_capacity=64, max_workers=1)
+
+    reachable = set(item[0] for item in items) - set(item[0] for item in enclosed)
+    assert set(tour) == reachable
+
+
+def test_joins_prefer_a_clear_entry_to_a_blocked_nearest_one():
+    # Joining every cell at the straight-line nearest pair, detouring when blocked, cost 673.2 here
+    rng = random.Random(103)
+    items = [(str(i), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(30)]
+    obstacles = [(f'OBS{i}', rng.uniform(0, 100), rng.uniform(0, 100), rng.uniform(5, 15)) for i in range(6)]
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items(items)
+    pathfinder.add_obstacles(obstacles)
+
+    tour = HierarchicalTour.hierarchical_tour(items, obstacles, '0', cell_capacity=5, max_workers=1)
+
+    assert set(tour) == set(pathfinder.mst_optimized_tour('0'))
+    assert pathfinder.tour_cost(tour) < 650
+
+
+def test_unreached_items_are_logged(caplog):
+    items = random_items(200)
+    obstacles = [('OBS', items[5][1], items[5][2], 0.5)]
+
+    with caplog.at_level(logging.WARNING):
+        tour = HierarchicalTour.hierarchical_tour(items, obstacles, '0', cell_capacity=64, max_workers=1)
+
+    assert '5' not in tour
+    assert 'left out 1 items' in caplog.text and ': 5' in caplog.text
@@ -0,0 +1,62 @@
+import itertools
+import random
+
+import pytest
+
+import LowerBounds
+import Pathfinder
+
+
+def random_pathfinder(count, seed=0):
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(count)])
+    return pathfinder
+
+
+def brute_force_costs(pathfinder):
+    """(cheapest closed tour, cheapest open path) over every item, by direct distances"""
+    first, *others = pathfinder.item_keys()
+    closed = min(pathfinder.tour_cost([first, *order, first]) for order in itertools.permutations(others))
+    open_path = min(pathfinder.tour_cost(order) for order in itertools.permutations([first, *others]))
+    return (closed, open_path)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_bounds_do_not_exceed_the_optimum(seed):
+    pathfinder = random_pathfinder(7, seed)
+    closed, open_path = brute_force_costs(pathfinder)
+
+    mst = LowerBounds.mst_weight(pathfinder.itemGraph)
+    one_tree = LowerBounds.one_tree_bound(pathfinder.itemGraph)
+
+    assert mst <= open_path + 1e-9
+    assert mst <= one_tree + 1e-9
+    assert one_tree <= closed + 1e-9
+
+
+def test_open_paths_are_only_bounded_by_the_mst():
+    pathfinder = random_pathfinder(30)
+    path = pathfinder.nearest_neighbour('0')['0']
+    assert path[0] != path[-1]
+
+    bounds = pathfinder.tour_bounds(path)
+
+    assert bounds['one_tree'] is None
+    assert bounds['gap'] == pytest.approx(
+        LowerBounds.optimality_gap(pathfinder.tour_cost(path), bounds['mst']))
+    assert bounds['gap'] >= 0
+
+
+def test_closed_tours_are_bounded_by_the_one_tree():
+    pathfinder = random_pathfinder(30)
+    tour = pathfinder.mst_optimized_tour('0')
+
+    bounds = pathfinder.tour_bounds(tour)
+
+    assert bounds['mst'] <= bounds['one_tree'] <= pathfinder.tour_cost(tour) + 1e-9
+    assert bounds['gap'] >= 0
+
+
+def test_gap_is_not_clamped():
+    assert LowerBounds.optimality_gap(8, 10) == pytest.approx(-0.2)
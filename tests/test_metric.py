@@ -0,0 +1,65 @@
+import math
+import random
+
+import numpy
+import pytest
+
+import Metric
+import Pathfinder
+import TourCache
+
+
+@pytest.mark.parametrize('name', sorted(Metric.METRICS))
+def test_distance_matches_pairwise(name):
+    metric = Metric.get_metric(name)
+    rng = numpy.random.default_rng(0)
+    for dimensions in (2, 3):
+        positions_a = rng.uniform(-50, 50, (20, dimensions))
+        positions_b = rng.uniform(-50, 50, (20, dimensions))
+
+        expected = [metric.distance(a, b) for a, b in zip(positions_a, positions_b)]
+        assert metric.pairwise(positions_a, positions_b) == pytest.approx(expected)
+
+
+def test_euclidean_distance():
+    metric = Metric.Euclidean()
+    assert metric.distance((0, 0), (3, 4)) == 5
+    assert metric.distance((1, 2, 3), (1, 2, 3)) == 0
+    assert metric.distance((0, 0, 0), (1, 2, 2)) == 3
+
+
+def test_callable_pairwise_broadcasts():
+    metric = Metric.CallableMetric(lambda a, b: abs(a[0] - b[0]) + 2 * abs(a[1] - b[1]))
+    distances = metric.pairwise(numpy.zeros((3, 1, 2)), numpy.ones((4, 2)))
+
+    assert distances.shape == (3, 4)
+    assert numpy.all(distances == 3)
+
+
+def test_equal_metrics_are_interchangeable():
+    assert Metric.Manhattan() == Metric.Manhattan()
+    assert hash(Metric.Manhattan()) == hash(Metric.get_metric('manhattan'))
+    assert Metric.Manhattan() != Metric.Chebyshev()
+    assert Metric.Euclidean() != Metric.CallableMetric(math.hypot)
+    assert Metric.CallableMetric(math.hypot) == Metric.CallableMetric(math.hypot)
+    assert Metric.CallableMetric(math.hypot) != Metric.CallableMetric(math.hypot, symmetric=True)
+
+    matrix = numpy.ones((3, 3))
+    assert Metric.CostMatrix(matrix) == Metric.CostMatrix(matrix)
+    assert Metric.CostMatrix(matrix) != Metric.CostMatrix(matrix.copy())
+
+
+def test_equal_metrics_share_cached_tours():
+    rng = random.Random(0)
+    items = [(str(i), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(20)]
+    cache = TourCache.TourCache()
+    tours = []
+
+    for _ in range(2):
+        pathfinder = Pathfinder.Pathfinder(metric=Metric.Manhattan())
+        pathfinder.tourCache = cache
+        pathfinder.add_items(items)
+        tours.append(pathfinder.mst_optimized_tour('0'))
+
+    assert tours[0] == tours[1]
+    assert cache.hits == 1
@@ -0,0 +1,75 @@
+import random
+
+import numpy
+
+import LineIntersection
+import Pathfinder
+
+
+def random_pathfinder(seed=0, item_count=80, obstacle_count=10):
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(item_count)])
+    pathfinder.add_obstacles([(f'OBS{i}', rng.uniform(0, 1000), rng.uniform(0, 1000), rng.uniform(10, 80))
+                              for i in range(obstacle_count)])
+    return pathfinder
+
+
+def rebuilt_blocked_edges(pathfinder):
+    """Blocked edges of the same map built from scratch, as unordered pairs"""
+    rebuilt = Pathfinder.Pathfinder()
+    rebuilt.add_items([(key, *pathfinder.item_position(key)) for key in pathfinder.item_keys()])
+    rebuilt.add_obstacles([(key, *pathfinder.obstacle_position_radius(key)) for key in pathfinder.obstacle_keys()])
+    return unordered(rebuilt.itemGraph.blockedEdges)
+
+
+def unordered(edges):
+    return set(frozenset(edge) for edge in edges)
+
+
+def test_segments_near_matches_a_full_scan():
+    rng = numpy.random.default_rng(0)
+    positions = rng.uniform(0, 1000, (60, 2))
+    index = LineIntersection.SegmentIndex([str(i) for i in range(60)], positions)
+    x1, y1, x2, y2 = index.segment_endpoints()
+
+    for x, y, r in rng.uniform(0, 1000, (30, 3)) * (1, 1, 0.2):
+        expected = numpy.flatnonzero(LineIntersection.segments_within_radius(x1, y1, x2, y2, x, y, r))
+        assert numpy.array_equal(index.segments_near(x, y, r), expected)
+
+
+def test_moving_obstacles_matches_a_rebuild():
+    pathfinder = random_pathfinder()
+    rng = random.Random(1)
+
+    for _ in range(20):
+        before = unordered(pathfinder.itemGraph.blockedEdges)
+        obs_id = rng.choice(pathfinder.obstacle_keys())
+        changed = pathfinder.move_obstacle(obs_id, rng.uniform(0, 1000), rng.uniform(0, 1000), rng.uniform(10, 80))
+
+        after = unordered(pathfinder.itemGraph.blockedEdges)
+        assert after == rebuilt_blocked_edges(pathfinder)
+        assert unordered(changed) == before ^ after
+
+
+def test_moving_items_matches_a_rebuild():
+    pathfinder = random_pathfinder()
+    rng = random.Random(2)
+
+    for _ in range(20):
+        before = unordered(pathfinder.itemGraph.blockedEdges)
+        changed = pathfinder.move_item(rng.choice(pathfinder.item_keys()), rng.uniform(0, 1000), rng.uniform(0, 1000))
+
+        after = unordered(pathfinder.itemGraph.blockedEdges)
+        assert after == rebuilt_blocked_edges(pathfinder)
+        assert unordered(changed) == before ^ after
+
+
+def test_moves_inside_a_batch_are_deferred():
+    pathfinder = random_pathfinder()
+
+    with pathfinder.batch():
+        assert pathfinder.move_obstacle('OBS0', 500, 500, 100) is None
+        assert pathfinder.move_item('0', 10, 10) is None
+
+    assert unordered(pathfinder.itemGraph.blockedEdges) == rebuilt_blocked_edges(pathfinder)
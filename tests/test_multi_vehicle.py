@@ -0,0 +1,56 @@
+import random
+
+import Pathfinder
+
+
+def random_pathfinder(count, seed=0):
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(count)])
+    return pathfinder
+
+
+def covered_keys(routes):
+    return set(key for path, cost in routes.values() for key in path)
+
+
+def test_routes_cover_every_item():
+    pathfinder = random_pathfinder(300)
+    routes = pathfinder.multi_vehicle_tours(['0', '1', '2'], max_workers=1)
+
+    assert covered_keys(routes) == set(pathfinder.item_keys())
+    for depot_key, (path, cost) in routes.items():
+        assert path[0] == path[-1] == depot_key
+
+
+def test_enclosed_depot_hands_its_items_to_other_vehicles():
+    pathfinder = random_pathfinder(300)
+    x, y = pathfinder.item_position('1')
+    pathfinder.add_obstacles([('OBS', x, y, 0.5)])
+
+    routes = pathfinder.multi_vehicle_tours(['0', '1', '2'], max_workers=1)
+
+    assert routes['1'][1] == 0
+    assert covered_keys(routes) == set(pathfinder.item_keys())
+
+
+def test_unreachable_items_are_left_out():
+    pathfinder = random_pathfinder(300)
+    x, y = pathfinder.item_position('5')
+    pathfinder.add_obstacles([('OBS', x, y, 0.5)])
+
+    routes = pathfinder.multi_vehicle_tours(['0', '1'], strategy='sweep', max_workers=1)
+
+    assert covered_keys(routes) == set(pathfinder.item_keys()) - {'5'}
+
+
+def test_a_given_executor_is_reused_and_left_open():
+    import concurrent.futures
+
+    pathfinder = random_pathfinder(200)
+    expected = pathfinder.multi_vehicle_tours(['0', '1', '2'], max_workers=1)
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        for _ in range(2):
+            assert pathfinder.multi_vehicle_tours(['0', '1', '2'], executor=executor) == expected
+        assert executor.submit(len, 'abc').result() == 3
@@ -0,0 +1,68 @@
+import math
+import random
+
+import numpy
+import pytest
+
+import CompleteGraph
+import Metric
+import Pathfinder
+
+STRATEGIES = ('a_star', 'alt', 'bidirectional', 'oracle')
+
+
+def obstacle_pathfinder(seed=0):
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(60)])
+    pathfinder.add_obstacles([(f'OBS{i}', rng.uniform(0, 1000), rng.uniform(0, 1000), 60) for i in range(12)])
+    return pathfinder
+
+
+def cost_matrix_graph(seed=0):
+    """Asymmetric costs with some missing edges, where detours are often cheaper than direct legs"""
+    rng = numpy.random.default_rng(seed)
+    matrix = rng.uniform(1, 100, (30, 30))
+    matrix[rng.random((30, 30)) < 0.3] = math.inf
+    numpy.fill_diagonal(matrix, 0)
+
+    graph = CompleteGraph.CompleteGraph(Metric.CostMatrix(matrix))
+    for i in range(30):
+        graph.push_vertex(str(i), position=(i,))
+    return graph
+
+
+def assert_matches_dijkstra(graph, strategy, pairs):
+    for start_key, end_key in pairs:
+        path, cost = graph.available_path(start_key, end_key, strategy)
+        expected_path, expected_cost = graph.available_path(start_key, end_key, 'dijkstra')
+
+        assert cost == pytest.approx(expected_cost)
+        if cost < math.inf:
+            assert path[0] == start_key and path[-1] == end_key
+            legs = sum(graph.metric.distance(graph.get_position(a), graph.get_position(b))
+                       for a, b in zip(path, path[1:]))
+            assert legs == pytest.approx(cost)
+            assert not any(graph.is_edge_blocked(a, b) for a, b in zip(path, path[1:]))
+        else:
+            assert path == expected_path == ['']
+
+
+def random_pairs(keys, count=150, seed=0):
+    rng = random.Random(seed)
+    return [(rng.choice(keys), rng.choice(keys)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_strategies_match_dijkstra_around_obstacles(strategy):
+    graph = obstacle_pathfinder().itemGraph
+    assert len(graph.blockedEdges) > 0
+
+    assert_matches_dijkstra(graph, strategy, random_pairs(graph.vertex_set_tuple()))
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_strategies_match_dijkstra_on_asymmetric_costs(strategy):
+    graph = cost_matrix_graph()
+
+    assert_matches_dijkstra(graph, strategy, random_pairs(graph.vertex_set_tuple()))
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import Pathfinder
+import TourCache
+
+
+def random_pathfinder(seed=0, item_count=40):
+    rng = random.Random(seed)
+    pathfinder = Pathfinder.Pathfinder()
+    pathfinder.add_items([(str(i), rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(item_count)])
+    pathfinder.add_obstacles([('OBS', 500, 500, 60)])
+    return pathfinder
+
+
+def test_closed_tours_rotate_to_new_starts():
+    cache = TourCache.TourCache()
+    cache.put('tour', 'A', None, 'map', ['A', 'B', 'C', 'A'])
+
+    assert cache.get('tour', 'A', None, 'map') == ['A', 'B', 'C', 'A']
+    assert cache.get('tour', 'C', None, 'map') == ['C', 'A', 'B', 'C']
+    assert cache.get('tour', 'D', None, 'map') is None
+    assert cache.get('tour', 'C', None, 'other map') is None
+    assert (cache.hits, cache.rotations, cache.misses) == (1, 1, 2)
+    assert cache.hit_rate() == 0.5
+
+
+def test_open_tours_are_not_rotated():
+    cache = TourCache.TourCache()
+    cache.put('path', 'A', None, 'map', ['A', 'B', 'C'], closed=False)
+
+    assert cache.get('path', 'B', None, 'map') is None
+
+
+def test_least_recently_used_tours_are_evicted():
+    cache = TourCache.TourCache(max_entries=2, allow_rotation=False)
+    cache.put('tour', 'A', None, 'map', ['A', 'B', 'A'])
+    cache.put('tour', 'B', None, 'map', ['B', 'A', 'B'])
+    cache.get('tour', 'A', None, 'map')
+    cache.put('tour', 'C', None, 'map', ['C', 'A', 'C'])
+
+    assert cache.get('tour', 'B', None, 'map') is None
+    assert cache.get('tour', 'A', None, 'map') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_waypoint_limit_bounds_the_cache():
+    cache = TourCache.TourCache(max_waypoints=5)
+    cache.put('tour', 'A', None, 'map', ['A', 'B', 'A'])
+    cache.put('tour', 'B', None, 'map', ['B', 'C', 'B'])
+    cache.put('tour', 'C', None, 'map', list('CABDEC'))
+
+    # The longer tour cannot fit at all, and the first tour made room for the second
+    assert cache.stats()['entries'] == 1 and cache.stats()['waypoints'] == 3
+    assert cache.get('tour', 'A', None, 'map') is None
+    assert cache.get('tour', 'B', None, 'map') == ['B', 'C', 'B']
+
+
+def test_negative_limits_are_rejected():
+    with pytest.raises(ValueError):
+        TourCache.TourCache(max_entries=-1)
+
+
+def test_pathfinder_reuses_tours_until_the_map_changes():
+    pathfinder = random_pathfinder()
+    tour = pathfinder.mst_optimized_tour('0')
+
+    assert pathfinder.mst_optimized_tour('0') == tour
+    assert pathfinder.tourCache.hits == 1
+
+    rotated = pathfinder.mst_optimized_tour('7')
+    assert rotated[0] == rotated[-1] == '7'
+    assert set(rotated) == set(tour)
+    assert pathfinder.tourCache.rotations == 1
+
+    pathfinder.add_obstacles([('OBS2', 200, 200, 40)])
+    misses = pathfinder.tourCache.misses
+    pathfinder.mst_optimized_tour('0')
+    assert pathfinder.tourCache.misses == misses + 1
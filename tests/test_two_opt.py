@@ -0,0 +1,59 @@
+import math
+import random
+
+import CompleteGraph
+import Metric
+import Pathfinder
+
+
+def uphill(position_a, position_b):
+    """Euclidean distance with climbs costing four times as much as descents"""
+    climb = position_b[1] - position_a[1]
+    return math.hypot(position_b[0] - position_a[0], climb) + (3 * climb if climb > 0 else 0)
+
+
+def order_cost(graph, order, closed=True):
+    legs = list(zip(order, order[1:] + order[:1] if closed else order[1:]))
+    return sum(graph.get_distance(key_a, key_b) for key_a, key_b in legs)
+
+
+def random_graph(count, metric=None, seed=0):
+    rng = random.Random(seed)
+    graph = CompleteGraph.CompleteGraph(metric)
+    for i in range(count):
+        graph.push_vertex(str(i), x=rng.uniform(0, 100), y=rng.uniform(0, 100))
+    return graph
+
+
+def test_never_worsens_orders_under_asymmetric_metrics():
+    graph = random_graph(7, Metric.CallableMetric(uphill))
+    rng = random.Random(1)
+
+    for closed in (True, False):
+        for _ in range(200):
+            order = list(graph.vertex_set_tuple())
+            rng.shuffle(order)
+            improved = graph.two_opt_order(order, closed=closed)
+
+            assert improved[0] == order[0]
+            assert sorted(improved) == sorted(order)
+            assert order_cost(graph, improved, closed) <= order_cost(graph, order, closed) + 1e-9
+
+
+def test_improves_symmetric_orders():
+    graph = random_graph(40)
+    order = list(graph.vertex_set_tuple())
+
+    assert order_cost(graph, graph.two_opt_order(order)) < order_cost(graph, order)
+
+
+def test_open_tour_improvement_under_asymmetric_metrics():
+    rng = random.Random(0)
+    pathfinder = Pathfinder.Pathfinder(metric=Metric.CallableMetric(uphill))
+    pathfinder.add_items([(str(i), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(30)])
+
+    unimproved = pathfinder.mst_open_tour('0', improve=False)
+    improved = pathfinder.mst_open_tour('0')
+
+    assert set(improved) == set(unimproved)
+    assert pathfinder.tour_cost(improved) <= pathfinder.tour_cost(unimproved) + 1e-9